@@ -1,5 +1,19 @@
 import sys
 import re
+import os
+import mmap
+import codecs
+from argparse import ArgumentParser
+from collections import Counter
+from multiprocessing import Pool
+
+# Tokens are runs of ASCII letters and digits of the decoded, lowercased text, the same
+# tokens tokenize produces.
+TOKEN_RE = re.compile(r'[A-Za-z0-9]+')
+# ASCII bytes other than letters and digits. UTF-8 never uses them inside another
+# character, so one always decodes to itself and ends the token before it.
+SEPARATOR_RE = re.compile(rb'[\x00-\x2f\x3a-\x40\x5b-\x60\x7b-\x7f]')
+CHUNK_SIZE = 1 << 20
 
 # The required methods are below.
 # When executing the program, please run the file and provide the input file in the argument
@@ -39,6 +53,78 @@ def computeWordFrequencies(tokens):
             frequency_map[token] = 1
     return frequency_map
 
+# Moves a range boundary to just after the next separator byte, where both decoding and
+# tokens start over, so every token is counted by exactly one range.
+def _range_boundary(mm, pos):
+    if pos <= 0:
+        return 0
+    if pos >= len(mm):
+        return len(mm)
+    match = SEPARATOR_RE.search(mm, pos - 1)
+    return match.end() if match else len(mm)
+
+# Yields the tokens of bytes start to end of a memory mapped file, one list per chunk.
+# Each chunk is decoded the way tokenize reads the file (utf-8, invalid bytes ignored) and
+# lowercased before matching, so b"ab\xffcd" is the token "abcd" and the Kelvin sign is "k".
+# A character or a token cut by the end of a chunk is carried into the next one.
+def _iterTokens(mm, start, end, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    carry = ''
+    pos = start
+    while pos < end:
+        stop = min(pos + chunk_size, end)
+        text = carry + decoder.decode(mm[pos:stop], final=stop == end).lower()
+        tokens = TOKEN_RE.findall(text)
+        carry = ''
+        if stop < end and tokens and text.endswith(tokens[-1]):
+            carry = tokens.pop()
+        yield tokens
+        pos = stop
+
+# Streaming version of tokenize + computeWordFrequencies for one byte range of a file.
+# The file is memory mapped and processed CHUNK_SIZE bytes at a time, so memory stays
+# O(chunk size + k) instead of holding the text, its cleaned copy and the token list.
+# The time complexity is still O(n) for the n bytes in the range.
+def countTokensInRange(file_path, start, end, chunk_size=CHUNK_SIZE):
+    counts = Counter()
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return counts
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = _range_boundary(mm, start)
+            end = _range_boundary(mm, end)
+            for tokens in _iterTokens(mm, start, end, chunk_size):
+                counts.update(tokens)
+    return counts
+
+def _count_range(args):
+    return countTokensInRange(*args)
+
+# Splits the file into one byte range per process and merges the partial counts.
+# The result is the same dictionary computeWordFrequencies(tokenize(file_path)) returns.
+def computeWordFrequenciesStreaming(file_path, processes=1, chunk_size=CHUNK_SIZE):
+    try:
+        size = os.path.getsize(file_path)
+        ranges = [(file_path, size * i // processes, size * (i + 1) // processes, chunk_size)
+                  for i in range(processes)]
+        if processes > 1:
+            with Pool(processes) as pool:
+                partial_counts = pool.map(_count_range, ranges)
+        else:
+            partial_counts = [_count_range(ranges[0])]
+
+        counts = Counter()
+        for partial in partial_counts:
+            counts.update(partial)
+        return dict(counts)
+
+    except FileNotFoundError:
+        print(f"Error: File '{file_path}' not found.")
+        return {}
+    except Exception as e:
+        print(f"Error reading file '{file_path}': {e}")
+        return {}
+
 # The time complexity for this would be O(k log k), where k is even small than m
 # The sorting method time complexity in python in general is O(n log n), in this case it would be O(k log k), 
 # while printing each pair is O(n), so for this case it would be O(k)
@@ -50,13 +136,22 @@ def PrintFrequencies(word_frequencies):
 # The reson it is not just O(n) is because the sorting function, and if a provided file had all unique characters/words then it would still take O(k log k) time, where m would be equal to n 
 def main():
     # Making sure the txt file is provided in the argument
-    if len(sys.argv) != 2:
+    if len(sys.argv) < 2:
             print("Please provide the file path for both python file and the input text file: python PartA.py <file_path>")
             sys.exit(1)
 
-    file_path = sys.argv[1]
-    tokens = tokenize(file_path) # running the tokanizer
-    frequency_count = computeWordFrequencies(tokens) # calculating the freaquecy count
+    # --stream counts tokens from a memory mapped file in chunks, for files that do not fit in memory
+    parser = ArgumentParser()
+    parser.add_argument("file_path")
+    parser.add_argument("--stream", action="store_true", default=False)
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.stream or args.processes > 1:
+        frequency_count = computeWordFrequenciesStreaming(args.file_path, args.processes)
+    else:
+        tokens = tokenize(args.file_path) # running the tokanizer
+        frequency_count = computeWordFrequencies(tokens) # calculating the freaquecy count
     PrintFrequencies(frequency_count) 
 
 if __name__ == "__main__":
@@ -1,5 +1,15 @@
 import sys
 import re
+import os
+import mmap
+import zlib
+import codecs
+import tempfile
+from argparse import ArgumentParser
+
+# Tokens are runs of letters and digits of the decoded, lowercased text, as in tokenize
+TOKEN_RE = re.compile(r'[A-Za-z0-9]+')
+CHUNK_SIZE = 1 << 20
 
 # Same function from PartA
 # The time complexity for this function would be linear, O(n)
@@ -34,17 +44,109 @@ def computeWordFrequencies(tokens):
             frequency_map[token] = 1
     return frequency_map
 
+# Same helper as PartA, yields the tokens of bytes start to end of a memory mapped file,
+# one list per chunk, decoded and lowercased the way tokenize reads the file
+def _iterTokens(mm, start, end, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    carry = ''
+    pos = start
+    while pos < end:
+        stop = min(pos + chunk_size, end)
+        text = carry + decoder.decode(mm[pos:stop], final=stop == end).lower()
+        tokens = TOKEN_RE.findall(text)
+        carry = ''
+        if stop < end and tokens and text.endswith(tokens[-1]):
+            carry = tokens.pop()
+        yield tokens
+        pos = stop
+
+# Yields the distinct lowercase tokens of each CHUNK_SIZE piece of a memory mapped file,
+# so only one chunk of the file is in memory at a time. O(n) for n bytes.
+def iterTokenChunks(file_path, chunk_size=CHUNK_SIZE):
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for tokens in _iterTokens(mm, 0, len(mm), chunk_size):
+                yield set(tokens)
+
+# Builds the vocabulary of only the smaller file and streams the larger file against it.
+# Memory is O(k) for the k unique tokens of the smaller file, time is O(n1 + n2).
+def countCommonTokensStreaming(file_path1, file_path2, chunk_size=CHUNK_SIZE):
+    if os.path.getsize(file_path1) > os.path.getsize(file_path2):
+        file_path1, file_path2 = file_path2, file_path1
+    vocabulary = set()
+    for tokens in iterTokenChunks(file_path1, chunk_size):
+        vocabulary.update(tokens)
+
+    common_tokens = set()
+    for tokens in iterTokenChunks(file_path2, chunk_size):
+        common_tokens.update(tokens & vocabulary)
+        # Tokens already found do not need to be looked up again
+        vocabulary -= common_tokens
+    return len(common_tokens)
+
+# Writes every distinct token of a file to one of `buckets` spill files chosen by hash
+def _partition(file_path, directory, prefix, buckets, chunk_size):
+    spill_files = [open(os.path.join(directory, f"{prefix}{i}"), 'wb') for i in range(buckets)]
+    try:
+        for tokens in iterTokenChunks(file_path, chunk_size):
+            for token in tokens:
+                data = token.encode('ascii')
+                spill_files[zlib.crc32(data) % buckets].write(data + b'\n')
+    finally:
+        for spill_file in spill_files:
+            spill_file.close()
+
+def _read_bucket(path):
+    with open(path, 'rb') as bucket:
+        return {line.rstrip(b'\n') for line in bucket}
+
+# External memory intersection: both files are partitioned by token hash into spill buckets
+# on disk, so a token can only be common within the same pair of buckets. Each pair is
+# intersected on its own, so memory is O(k / buckets) and inputs can be much larger than RAM.
+# The time complexity stays O(n1 + n2) plus writing and reading the buckets once.
+def countCommonTokensExternal(file_path1, file_path2, buckets=64, chunk_size=CHUNK_SIZE):
+    with tempfile.TemporaryDirectory() as directory:
+        _partition(file_path1, directory, "a", buckets, chunk_size)
+        _partition(file_path2, directory, "b", buckets, chunk_size)
+        common_count = 0
+        for i in range(buckets):
+            bucket1 = _read_bucket(os.path.join(directory, f"a{i}"))
+            with open(os.path.join(directory, f"b{i}"), 'rb') as bucket2:
+                common_count += len({line.rstrip(b'\n') for line in bucket2 if line.rstrip(b'\n') in bucket1})
+        return common_count
+
 # The overall time complexity would be linear, O(n1 + n2 + m1 + m2 + k1 + k2), but on large scale, it is just O(n).
 # Where k is from the below intersection method to kind common tokens between the two files
 def main():
     # Making sure that 2 txt files are provided in the argument
-    if len(sys.argv) != 3:
+    if len(sys.argv) < 3:
             print("Please provide the file path for python file and two input text file: python PartB.py <file1_path> <file2_path>")
             sys.exit(1)
 
+    # --mode vocab streams the larger file against the smaller file's vocabulary,
+    # --mode external intersects hash partitioned spill files for inputs larger than memory
+    parser = ArgumentParser()
+    parser.add_argument("file_path1")
+    parser.add_argument("file_path2")
+    parser.add_argument("--mode", choices=["memory", "vocab", "external"], default="memory")
+    parser.add_argument("--buckets", type=int, default=64)
+    args = parser.parse_args()
+
     # Getting the file path from each txt file
-    file_path1 = sys.argv[1]
-    file_path2 = sys.argv[2]
+    file_path1 = args.file_path1
+    file_path2 = args.file_path2
+
+    if args.mode != "memory":
+        try:
+            if args.mode == "vocab":
+                print(countCommonTokensStreaming(file_path1, file_path2))
+            else:
+                print(countCommonTokensExternal(file_path1, file_path2, args.buckets))
+        except FileNotFoundError as e:
+            print(f"Error: File '{e.filename}' not found.")
+        return
 
     tokens_file1 = tokenize(file_path1) # running tokenizer for file 1
     tokens_file2 = tokenize(file_path2) # runnign tokenizer for file 2
@@ -0,0 +1,95 @@
+''' Compares the shelve based frontier save file with FrontierStore.
+
+Writes the same synthetic crawl (N discovered urls, a fraction of them
+completed) through both backends the way Frontier.add_url and
+Frontier.mark_url_complete do, then times reopening each file and rebuilding
+the list of urls still to be downloaded.
+
+    python -m benchmarks.frontier_restart --urls 5000
+'''
+import os
+import time
+import shelve
+import tempfile
+
+from argparse import ArgumentParser
+
+from utils import get_urlhash
+from crawler.frontier_store import FrontierStore
+
+
+def synthetic_urls(count):
+    return [
+        f"https://www.ics.uci.edu/page/{i // 100}/{i}"
+        for i in range(count)]
+
+
+def write_shelve(path, urls, completed):
+    # Shelve keys must be strings, as the SHA-256 hex keys used to be.
+    save = shelve.open(path)
+    for url in urls:
+        save[get_urlhash(url).hex()] = (url, False)
+        save.sync()
+    for url in urls[:completed]:
+        save[get_urlhash(url).hex()] = (url, True)
+        save.sync()
+    save.close()
+
+
+def restart_shelve(path):
+    save = shelve.open(path)
+    pending = [url for url, completed in save.values() if not completed]
+    save.close()
+    return pending
+
+
+def write_store(path, urls, completed, flush_count):
+    save = FrontierStore(path, flush_count=flush_count)
+    for url in urls:
+        save[get_urlhash(url)] = (url, False)
+    for url in urls[:completed]:
+        save[get_urlhash(url)] = (url, True)
+    save.close()
+
+
+def restart_store(path):
+    save = FrontierStore(path)
+    pending = [url for urls in save.pending() for url in urls]
+    save.close()
+    return pending
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(url_count, completed_ratio, flush_count):
+    urls = synthetic_urls(url_count)
+    completed = int(url_count * completed_ratio)
+    with tempfile.TemporaryDirectory() as tmp:
+        shelve_path = os.path.join(tmp, "frontier.shelve")
+        store_path = os.path.join(tmp, "frontier.db")
+
+        shelve_write, _ = timed(write_shelve, shelve_path, urls, completed)
+        shelve_restart, shelve_pending = timed(restart_shelve, shelve_path)
+        store_write, _ = timed(
+            write_store, store_path, urls, completed, flush_count)
+        store_restart, store_pending = timed(restart_store, store_path)
+
+    assert sorted(shelve_pending) == sorted(store_pending)
+    print(f"{url_count} urls, {completed} completed, "
+          f"{len(store_pending)} pending")
+    print(f"{'backend':<10}{'write (s)':>12}{'restart (s)':>14}")
+    print(f"{'shelve':<10}{shelve_write:>12.3f}{shelve_restart:>14.3f}")
+    print(f"{'sqlite':<10}{store_write:>12.3f}{store_restart:>14.3f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=5000)
+    parser.add_argument("--completed", type=float, default=0.5)
+    parser.add_argument("--flush_count", type=int, default=500)
+    args = parser.parse_args()
+    main(args.urls, args.completed, args.flush_count)
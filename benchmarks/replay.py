@@ -0,0 +1,277 @@
+''' End to end crawler benchmark against a local stand-in cache server.
+
+The server runs in its own process and answers the same requests as the
+spacetime cache server (GET /?q=<url>&u=<useragent>) with a cbor encoded
+dict holding a pickled requests.Response, which is what utils.download
+expects. Pages come from a synthetic site graph (or a recorded
+{url: html} JSON file) that includes crawler traps: tribe-bar-date
+calendars, git history/commit/tree views, an open ended month calendar
+and near duplicate session pages.
+
+The crawler itself runs unmodified in a temporary directory and the
+harness reports pages/s, CPU seconds per page, peak RSS and the time to
+reopen the frontier save file.
+
+    python -m benchmarks.replay --pages_per_host 300 --threads 4
+'''
+import os
+import time
+import json
+import zlib
+import random
+import pickle
+import resource
+import tempfile
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from multiprocessing import Process, Queue
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import cbor
+import requests
+
+HOSTS = [
+    "www.ics.uci.edu", "vision.ics.uci.edu", "www.cs.uci.edu",
+    "www.informatics.uci.edu", "www.stat.uci.edu"]
+
+
+class SiteGraph(object):
+    ''' Deterministic synthetic site. Every page is generated from a hash of
+    its url, so the server needs no state and runs are repeatable. '''
+
+    def __init__(self, pages_per_host, links_per_page=10, vocabulary=5000):
+        self.pages_per_host = pages_per_host
+        self.links_per_page = links_per_page
+        self.words = [self._word(i) for i in range(vocabulary)]
+
+    @staticmethod
+    def _word(i):
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        word = ""
+        i += 26
+        while i:
+            i, rest = divmod(i, 26)
+            word += letters[rest]
+        return word + "ex"
+
+    def seed_urls(self):
+        return [f"https://{host}/page/0.html" for host in HOSTS]
+
+    def page(self, url):
+        ''' Returns the html for url, or None if it does not exist. '''
+        parsed = urlparse(url)
+        if parsed.netloc not in HOSTS:
+            return None
+        rng = random.Random(zlib.crc32(url.encode("utf-8")))
+        path = parsed.path
+        links = list()
+        if path.startswith("/page/") and path.endswith(".html"):
+            number = path[len("/page/"):-len(".html")]
+            if not number.isdigit() or int(number) >= self.pages_per_host:
+                return None
+            for _ in range(self.links_per_page):
+                links.append(f"/page/{rng.randrange(self.pages_per_host)}.html")
+            other = rng.choice(HOSTS)
+            links.append(
+                f"https://{other}/page/{rng.randrange(self.pages_per_host)}.html")
+            if int(number) % 10 == 0:
+                links.extend(self._trap_links(rng))
+            body_words = [rng.choice(self.words) for _ in range(300)]
+        elif path == "/events/":
+            # tribe-bar-date calendar: every day links to the next one.
+            day = parse_qs(parsed.query).get("tribe-bar-date", ["2024-01-01"])[0]
+            links.append(f"/events/?tribe-bar-date={day[:8]}{int(day[8:]) % 28 + 1:02d}")
+            body_words = [rng.choice(self.words) for _ in range(300)]
+        elif path.startswith("/calendar/"):
+            # Month calendar that is not in BLOCKED_PATTERNS.
+            year, month = map(int, path.strip("/").split("/")[1:3])
+            if not 1990 <= year <= 2040:
+                return None
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            links.append(f"/calendar/{year}/{month}/")
+            body_words = ["calendar", "month", "events", "nothing"] * 60
+            body_words.append(f"m{'x' * (month + 1)}")
+        elif path == "/git/":
+            commit = rng.randrange(10 ** 6)
+            links.extend(
+                f"/git/?p=repo.git;a={view};h={commit + 1}"
+                for view in ("commit", "tree", "history", "blob_plain"))
+            body_words = [rng.choice(self.words) for _ in range(300)]
+        elif path == "/news/item":
+            # Same story under many session ids: near duplicates.
+            session = parse_qs(parsed.query).get("session", ["0"])[0]
+            links.append(f"/news/item?session={int(session) + 1}")
+            story = random.Random(7)
+            body_words = [story.choice(self.words) for _ in range(300)]
+            body_words.append("viewed" + "x" * (int(session) % 5))
+        else:
+            return None
+        anchors = "".join(f'<a href="{link}">link</a> ' for link in links)
+        return (
+            "<html><head><title>page</title>"
+            "<script>var tracker = 'ignored words here';</script></head>"
+            f"<body><p>{' '.join(body_words)}</p>{anchors}</body></html>")
+
+    def _trap_links(self, rng):
+        return [
+            "/events/?tribe-bar-date=2024-01-01",
+            f"/calendar/{rng.randrange(2000, 2030)}/{rng.randrange(1, 13)}/",
+            f"/git/?p=repo.git;a=commit;h={rng.randrange(10 ** 6)}",
+            f"/news/item?session={rng.randrange(100)}"]
+
+
+class RecordedGraph(object):
+    ''' Site graph loaded from a {url: html} JSON file. '''
+
+    def __init__(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.pages = json.load(f)
+
+    def seed_urls(self):
+        return list(self.pages)[:1]
+
+    def page(self, url):
+        return self.pages.get(url)
+
+
+def make_handler(graph):
+    class CacheHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = parse_qs(urlparse(self.path).query)["q"][0]
+            page = graph.page(url)
+            raw = requests.Response()
+            raw.url = url
+            raw.status_code = 200 if page is not None else 404
+            raw.headers["Content-Type"] = "text/html; charset=utf-8"
+            raw._content = (page or "Not Found").encode("utf-8")
+            body = cbor.dumps({
+                "url": url, "status": raw.status_code,
+                "response": pickle.dumps(raw)})
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CacheHandler
+
+
+def serve(graph, port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(graph))
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def make_config(graph, args):
+    from utils.config import Config
+    cparser = ConfigParser()
+    cparser.read_dict({
+        "IDENTIFICATION": {"USERAGENT": "IR benchmark replay"},
+        "CONNECTION": {"HOST": "127.0.0.1", "PORT": "0"},
+        "CRAWLER": {
+            "SEEDURL": ",".join(graph.seed_urls()),
+            "POLITENESS": str(args.politeness),
+            "TRAPDETECTION": str(not args.no_trap_detection)},
+        "LOCAL PROPERTIES": {
+            "SAVE": "frontier.db", "THREADCOUNT": str(args.threads),
+            "DOWNLOADMODE": args.mode,
+            "PARSEPROCESSES": str(args.parse_processes),
+            "SHARDS": str(args.shards)}})
+    return Config(cparser)
+
+
+def children_cpu():
+    # CPU time of finished child processes (parse pool, crawl shards), which
+    # includes the stand-in server only once it is terminated.
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main(args):
+    graph = (RecordedGraph(args.recorded) if args.recorded
+             else SiteGraph(args.pages_per_host))
+    port_queue = Queue()
+    server = Process(target=serve, args=(graph, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get()
+
+    # scraper writes its reports to the working directory, so the crawl runs
+    # in a scratch one.
+    from crawler import Crawler
+    from crawler.frontier import Frontier
+    from crawler.worker import Worker
+    from crawler.async_worker import AsyncWorker
+    from crawler.sharding import ShardedCrawler
+    from crawler.frontier_store import FrontierStore
+    from utils import shard_path
+    import scraper
+
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            config = make_config(graph, args)
+            config.cache_server = ("127.0.0.1", port)
+            worker_factory = AsyncWorker if args.mode == "async" else Worker
+
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time() + children_cpu()
+            if args.shards > 1:
+                ShardedCrawler(config, True, worker_factory=worker_factory).start()
+                save_files = [shard_path(config.save_file, shard_id) for shard_id in range(args.shards)]
+            else:
+                crawler = Crawler(config, True, worker_factory=worker_factory)
+                crawler.start()
+                crawler.frontier.save.close()
+                save_files = [config.save_file]
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() + children_cpu() - cpu_start
+            pages = 0
+            for save_file in save_files:
+                save = FrontierStore(save_file)
+                pages += sum(1 for _, completed in save.values() if completed)
+                save.close()
+            # Restart is timed on one save file; shards reopen theirs in parallel.
+            config.save_file = save_files[0]
+
+            restart_start = time.perf_counter()
+            frontier = Frontier(config, False)
+            while frontier.loading:
+                time.sleep(0.001)
+            restart = time.perf_counter() - restart_start
+            frontier.save.close()
+            rejections = scraper.stats.rejections()
+    finally:
+        os.chdir(cwd)
+        server.terminate()
+
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+    print(f"pages downloaded   {pages}")
+    print(f"wall time          {wall:.2f} s")
+    print(f"pages/s            {pages / wall:.1f}")
+    print(f"cpu per page       {cpu / max(pages, 1) * 1000:.2f} ms")
+    print(f"peak rss           {peak_rss:.1f} MiB")
+    print(f"frontier restart   {restart * 1000:.1f} ms")
+    print(f"rejected by stage  {rejections}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages_per_host", type=int, default=200)
+    parser.add_argument("--recorded", type=str, default=None,
+                        help="JSON file of {url: html} to serve instead")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--mode", choices=["threaded", "async"], default="threaded")
+    parser.add_argument("--parse_processes", type=int, default=0)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--no_trap_detection", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+''' Microbenchmark of scraper.is_valid against the previous implementation.
+
+The corpus is the set of urls recorded in page_word_count.json plus
+variants of each (file extensions, calendar and git traps, off-domain
+hosts, other schemes) so every branch of the filter is exercised.
+
+    python -m benchmarks.url_filter --repeat 20
+'''
+import re
+import json
+import time
+
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+import scraper
+
+
+def legacy_is_valid(url):
+    # scraper.is_valid as it was before the compiled UrlFilter.
+    try:
+        parsed = urlparse(url)
+        if parsed.scheme not in {"http", "https"}:
+            return False
+        if parsed.netloc not in scraper.ALLOWED_DOMAINS and not parsed.netloc.endswith(tuple(scraper.ALLOWED_DOMAINS)):
+            return False
+        if re.search(r"(\?|&)tribe-bar-date=\d{4}-\d{2}-\d{2}", url):
+            return False
+        if re.search(r"(\?|&)(a=history|a=blobdiff|a=commit)", url):
+            return False
+        return not re.match(
+            r".*\.(css|js|bmp|gif|jpe?g|ico"
+            + r"|png|tiff?|mid|mp2|mp3|mp4"
+            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+            + r"|epub|dll|cnf|tgz|sha1"
+            + r"|thmx|mso|arff|rtf|jar|csv"
+            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$",
+            parsed.path.lower(),
+        )
+    except TypeError:
+        return False
+
+
+def harvest_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        urls = list(json.load(f))
+    corpus = list(urls)
+    for url in urls:
+        corpus.append(url + "/slides.PDF")
+        corpus.append(url + "?tribe-bar-date=2024-01-01")
+        corpus.append(url + "?p=repo.git;a=history")
+        corpus.append(url.replace(".uci.edu", ".example.com", 1))
+        corpus.append(url.replace("http", "ftp", 1))
+    return corpus
+
+
+def bench(func, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url in corpus:
+            func(url)
+    return (time.perf_counter() - start) / (repeat * len(corpus))
+
+
+def main(corpus_file, repeat):
+    corpus = harvest_corpus(corpus_file)
+    legacy = bench(legacy_is_valid, corpus, repeat)
+    compiled = bench(scraper.is_valid, corpus, repeat)
+    # The trie only matches whole labels, so hosts such as physics.uci.edu
+    # that merely end in "ics.uci.edu" are no longer accepted.
+    differing = sum(
+        legacy_is_valid(url) != scraper.is_valid(url) for url in corpus)
+    print(f"{len(corpus)} urls, {differing} classified differently")
+    print(f"legacy   {legacy * 1e6:8.2f} us/url")
+    print(f"compiled {compiled * 1e6:8.2f} us/url "
+          f"({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default="page_word_count.json")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.corpus, args.repeat)
@@ -1,4 +1,6 @@
 from utils import get_logger
+from utils.metrics import metrics, start_metrics
+import scraper
 from crawler.frontier import Frontier
 from crawler.worker import Worker
 
@@ -6,11 +8,23 @@ class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("CRAWLER")
+        scraper.load_url_filter(config)
+        scraper.load_stats(config)
+        scraper.load_checkpoint(restart)
+        scraper.load_near_duplicate_index(config)
+        scraper.load_seen_sets(config)
         self.frontier = frontier_factory(config, restart)
+        scraper.load_trap_detector(getattr(self.frontier, "trap_detector", None))
+        if config.metrics_enabled:
+            start_metrics(config, self.logger)
+            metrics.add_gauge("frontier_queue_depth", self.frontier.queue_depth)
+            metrics.add_gauge("frontier_in_flight", self.frontier.in_flight_count)
         self.workers = list()
         self.worker_factory = worker_factory
 
     def start_async(self):
+        if self.config.parse_processes > 0:
+            scraper.start_parse_pool(self.config.parse_processes)
         self.workers = [
             self.worker_factory(worker_id, self.config, self.frontier)
             for worker_id in range(self.config.threads_count)]
@@ -24,3 +38,4 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+        scraper.stop_parse_pool()
@@ -0,0 +1,84 @@
+import time
+import asyncio
+
+from threading import Thread
+
+from utils.async_download import AsyncDownloader
+from utils import get_logger
+from utils.log import PER_URL, set_rate_limit
+from utils.metrics import metrics
+from urllib.parse import urlparse
+import scraper
+from scraper import save_data
+from crawler.worker import is_transient_failure
+
+
+class AsyncWorker(Thread):
+    ''' Worker that runs an asyncio event loop with config.async_concurrency
+    fetch coroutines sharing one AsyncDownloader. Politeness is still
+    enforced by the frontier; scraping runs on the loop's executor so it
+    does not stall outstanding downloads. '''
+
+    # Longest a coroutine sleeps before polling the frontier again, so urls
+    # added while it waits are picked up promptly.
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, worker_id, config, frontier):
+        self.logger = get_logger(f"Worker-{worker_id}", "Worker")
+        set_rate_limit(self.logger, config.log_url_rate)
+        self.config = config
+        self.frontier = frontier
+        super().__init__(daemon=True)
+
+    def run(self):
+        asyncio.run(self._crawl())
+        self.logger.info("Crawling finished. Saving data...")
+        save_data()
+        self.logger.info("Data saved successfully!")
+
+    async def _crawl(self):
+        downloader = AsyncDownloader(
+            self.config, self.config.async_concurrency)
+        try:
+            await asyncio.gather(*(
+                self._fetch_loop(downloader)
+                for _ in range(self.config.async_concurrency)))
+        finally:
+            downloader.close()
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _fetch_loop(self, downloader):
+        loop = asyncio.get_running_loop()
+        while True:
+            tbd_url, wait = self.frontier.poll_tbd_url()
+            if tbd_url is None:
+                if wait is None:
+                    return
+                await asyncio.sleep(min(wait, self.POLL_INTERVAL))
+                continue
+            failed = False
+            latency = None
+            try:
+                start = time.monotonic()
+                with metrics.timer("download", urlparse(tbd_url).netloc):
+                    resp = await downloader.download(tbd_url, self.logger)
+                latency = time.monotonic() - start
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.", extra=PER_URL)
+                failed = is_transient_failure(resp)
+                if not failed:
+                    await loop.run_in_executor(
+                        None, self._process, tbd_url, resp)
+            finally:
+                if failed:
+                    self.frontier.mark_url_failed(tbd_url, latency)
+                else:
+                    self.frontier.mark_url_complete(tbd_url, latency)
+                metrics.count("pages")
+
+    def _process(self, tbd_url, resp):
+        scraped_urls = scraper.scraper(tbd_url, resp)
+        with metrics.timer("frontier"):
+            for scraped_url in scraped_urls:
+                self.frontier.add_url(scraped_url)
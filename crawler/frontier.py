@@ -1,17 +1,47 @@
 import os
-import shelve
+import time
+import heapq
 
-from threading import Thread, RLock
+from threading import Thread, RLock, Condition
 from queue import Queue, Empty
+from collections import deque
+from urllib.parse import urlparse
 
 from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from crawler.frontier_store import FrontierStore
+from utils.trap_detector import TrapDetector
 
 class Frontier(object):
+    # Backoff, in seconds, after the first failure on a host that is not
+    # already being delayed longer.
+    MIN_BACKOFF = 1.0
+    # Seconds an idle caller waits before checking again whether the crawl
+    # has finished.
+    IDLE_POLL = 0.1
+
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # Politeness scheduling state. Each host has its own queue of urls and
+        # a ready time; the heap holds (ready_time, host) for every host that
+        # has queued urls and no fetch in flight.
+        self.lock = RLock()
+        self.ready_cv = Condition(self.lock)
+        self.host_queues = dict()
+        self.ready_heap = list()
+        self.scheduled_hosts = set()
+        self.in_flight = dict()
+        self.busy_hosts = set()
+        self.next_ready = dict()
+        self.queued = 0
+        # Adaptive politeness: a per host backoff that doubles on transient
+        # failures and halves on success, an EWMA of response times, and
+        # the retry count of urls that failed.
+        self.host_backoff = dict()
+        self.host_latency = dict()
+        self.retries = dict()
+        # True while pending urls from the save file are still streaming in.
+        self.loading = False
         
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
@@ -22,9 +52,17 @@ class Frontier(object):
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            FrontierStore.remove(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = FrontierStore(
+            self.config.save_file, self.config.save_flush_count,
+            self.config.save_flush_interval)
+        # Learns url templates that keep producing nothing new; its counts
+        # are saved in the same file.
+        self.trap_detector = (
+            TrapDetector.from_config(
+                config, self.save, get_logger("TRAPS", "FRONTIER"))
+            if config.trap_detection else None)
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
@@ -36,37 +74,207 @@ class Frontier(object):
                     self.add_url(url)
 
     def _parse_save_file(self):
-        ''' This function can be overridden for alternate saving techniques. '''
-        total_count = len(self.save)
+        ''' This function can be overridden for alternate saving techniques.
+
+        Pending urls are streamed from the store's pending index on a
+        background thread, so workers can start fetching before the whole
+        backlog is loaded. Urls were checked with is_valid when they were
+        added, so they are not filtered again here. '''
+        self.loading = True
+        # Bound the pending urls before anything (seeds included) is added.
+        batches = self.save.pending()
+        Thread(target=self._load_pending, args=(batches,), daemon=True).start()
+
+    def _load_pending(self, batches):
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        try:
+            for urls in batches:
+                with self.lock:
+                    for url in urls:
+                        self._enqueue(url)
+                tbd_count += len(urls)
+        finally:
+            with self.lock:
+                self.loading = False
+                self.ready_cv.notify_all()
         self.logger.info(
-            f"Found {tbd_count} urls to be downloaded from {total_count} "
-            f"total urls discovered.")
+            f"Found {tbd_count} urls to be downloaded from the save file.")
+
+    @staticmethod
+    def _get_host(url):
+        return urlparse(url).netloc.lower()
+
+    def _schedule(self, host):
+        # Called with the lock held. Puts a host on the ready heap if it has
+        # work and is not already scheduled or being fetched.
+        if (host in self.scheduled_hosts or host in self.busy_hosts
+                or not self.host_queues.get(host)):
+            return
+        heapq.heappush(
+            self.ready_heap, (self.next_ready.get(host, 0.0), host))
+        self.scheduled_hosts.add(host)
+        self.ready_cv.notify()
+
+    def _enqueue(self, url, retry=False):
+        with self.lock:
+            host = self._get_host(url)
+            queue = self.host_queues.setdefault(host, deque())
+            # Urls are popped from the right, so retries go to the back.
+            if retry:
+                queue.appendleft(url)
+            else:
+                queue.append(url)
+            self.queued += 1
+            self._schedule(host)
+
+    def _is_blocked(self, url):
+        # Urls queued before the trap detector blocked their template.
+        return (self.trap_detector is not None
+                and self.trap_detector.is_blocked(url))
+
+    def _pop_ready(self):
+        # Called with the lock held. Returns (url, wait) where url is the next
+        # url that may be fetched right now, or None with the number of
+        # seconds until a host becomes ready (None if nothing is queued).
+        while self.ready_heap:
+            ready_time, host = self.ready_heap[0]
+            wait = ready_time - time.monotonic()
+            if wait > 0:
+                return None, wait
+            heapq.heappop(self.ready_heap)
+            self.scheduled_hosts.discard(host)
+            queue = self.host_queues[host]
+            url = None
+            while queue and url is None:
+                url = queue.pop()
+                self.queued -= 1
+                if self._is_blocked(url):
+                    self.save[get_urlhash(url)] = (url, True)
+                    url = None
+            if not queue:
+                del self.host_queues[host]
+            if url is not None:
+                self.in_flight[url] = host
+                self.busy_hosts.add(host)
+                return url, 0.0
+        return None, None
+
+    def _finished(self):
+        # Called with the lock held once nothing is queued. In flight pages
+        # and the save file loader may still add urls.
+        return not self.in_flight and not self.loading
 
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        ''' Blocks until a url from a host that is past its politeness delay
+        is available. Returns None once nothing is queued or in flight. '''
+        with self.lock:
+            while True:
+                url, wait = self._pop_ready()
+                if url is not None:
+                    return url
+                if wait is None and self._finished():
+                    # Wake up any other worker waiting so it can exit too.
+                    self.ready_cv.notify_all()
+                    self.save.flush()
+                    return None
+                # Either the next host is not ready yet, or in flight pages
+                # may still add urls to the frontier.
+                self.ready_cv.wait(
+                    wait if wait is not None else self.IDLE_POLL)
+
+    def poll_tbd_url(self):
+        ''' Non-blocking variant of get_tbd_url for event loop workers.
+        Returns (url, None) if a url can be fetched now, (None, wait) if the
+        caller should poll again after at most wait seconds, and
+        (None, None) once nothing is queued or in flight. '''
+        with self.lock:
+            url, wait = self._pop_ready()
+            if url is not None:
+                return url, None
+            if wait is None and self._finished():
+                self.ready_cv.notify_all()
+                self.save.flush()
+                return None, None
+            return None, wait if wait is not None else self.IDLE_POLL
+
+    def queue_depth(self):
+        ''' Number of urls waiting to be downloaded. '''
+        return self.queued
+
+    def in_flight_count(self):
+        return len(self.in_flight)
 
     def add_url(self, url):
         url = normalize(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+        with self.lock:
+            if urlhash not in self.save:
+                if (self.trap_detector is not None
+                        and not self.trap_detector.allow(url)):
+                    # Saved as done so it is not considered again.
+                    self.save[urlhash] = (url, True)
+                    return
+                self.save[urlhash] = (url, False)
+                self._enqueue(url)
     
-    def mark_url_complete(self, url):
+    def _host_delay(self, host):
+        # Called with the lock held. Never below the configured politeness.
+        return max(
+            self.config.time_delay, self.host_backoff.get(host, 0.0),
+            self.config.latency_factor * self.host_latency.get(host, 0.0))
+
+    def _release_host(self, url, latency, failed):
+        # Called with the lock held. Updates the host's latency and backoff
+        # and schedules it again once its delay has passed.
+        host = self.in_flight.pop(url, None)
+        if host is None:
+            return
+        self.busy_hosts.discard(host)
+        if latency is not None:
+            average = self.host_latency.get(host)
+            self.host_latency[host] = (
+                latency if average is None else 0.8 * average + 0.2 * latency)
+        backoff = self.host_backoff.get(host, 0.0)
+        if failed:
+            self.host_backoff[host] = min(
+                self.config.max_backoff,
+                max(2 * backoff, 2 * self.config.time_delay, self.MIN_BACKOFF))
+        elif backoff:
+            # Healthy again: tighten back toward the configured delay.
+            if backoff / 2 <= self.config.time_delay:
+                del self.host_backoff[host]
+            else:
+                self.host_backoff[host] = backoff / 2
+        self.next_ready[host] = time.monotonic() + self._host_delay(host)
+        self._schedule(host)
+
+    def mark_url_complete(self, url, latency=None):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        with self.lock:
+            if urlhash not in self.save:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+
+            self.save[urlhash] = (url, True)
+            self.retries.pop(url, None)
+            self._release_host(url, latency, failed=False)
+            # Waiting workers may need to exit now that nothing is in flight.
+            self.ready_cv.notify_all()
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+    def mark_url_failed(self, url, latency=None):
+        ''' Backs off the url's host after a transient failure (5xx or
+        timeout) and puts the url back in the queue, until it has failed
+        config.max_retries times; then it is marked complete. '''
+        with self.lock:
+            retries = self.retries.get(url, 0) + 1
+            self._release_host(url, latency, failed=True)
+            if retries > self.config.max_retries:
+                self.logger.error(
+                    f"Giving up on {url} after {retries} failed attempts.")
+                self.retries.pop(url, None)
+                self.save[get_urlhash(url)] = (url, True)
+            else:
+                self.retries[url] = retries
+                self._enqueue(url, retry=True)
+            self.ready_cv.notify_all()
@@ -0,0 +1,233 @@
+import os
+import time
+import sqlite3
+
+from threading import Thread, RLock, Event
+
+from utils import get_urlhash, normalize
+
+
+class FrontierStore(object):
+    ''' SQLite (WAL mode) backed persistence for the frontier.
+
+    Updates are buffered in memory and written in a single transaction
+    (group commit) once flush_count updates are pending or flush_interval
+    seconds have passed, instead of syncing the save file on every url.
+    WAL keeps the file consistent after a crash; at most the last unflushed
+    batch is lost, and those urls are simply rediscovered or refetched. '''
+
+    # Version 1 keys urls by the 16 byte get_urlhash of their normalized
+    # spelling; version 0 files used SHA-256 hex strings.
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path, flush_count=500, flush_interval=5.0):
+        self.path = path
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+        self.lock = RLock()
+        # {urlhash: (url, completed)} not yet written to disk.
+        self.buffer = dict()
+        # {template: counts} of the trap detector not yet written to disk.
+        self.template_buffer = dict()
+        # {urlhash: url} handed to another shard, not yet written to disk.
+        self.forward_buffer = dict()
+        self.last_flush = time.monotonic()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < self.SCHEMA_VERSION and self._has_url_table():
+            self._migrate()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash BLOB PRIMARY KEY, url TEXT NOT NULL, "
+            "completed INTEGER NOT NULL DEFAULT 0)")
+        self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        # Resume only needs the pending urls, so keep them indexed on their
+        # own instead of scanning the whole table.
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS pending_urls ON urls (completed) "
+            "WHERE completed = 0")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS trap_templates ("
+            "template TEXT PRIMARY KEY, discovered INTEGER NOT NULL, "
+            "fetched INTEGER NOT NULL, novel INTEGER NOT NULL, "
+            "blocked INTEGER NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS forwarded ("
+            "urlhash BLOB PRIMARY KEY, url TEXT NOT NULL)")
+        self.conn.commit()
+
+        self._stopped = Event()
+        self._flusher = Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    @staticmethod
+    def remove(path):
+        ''' Deletes a save file along with its WAL side files. '''
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _has_url_table(self):
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+            "AND name = 'urls'").fetchone() is not None
+
+    def _migrate(self):
+        # Rekeys an old save file. Urls that normalize to the same spelling
+        # collapse into one row, completed if any of them was.
+        self.conn.create_function("normalize", 1, normalize)
+        self.conn.create_function(
+            "urlhash", 1, lambda url: get_urlhash(normalize(url)))
+        with self.conn:
+            self.conn.execute("DROP INDEX IF EXISTS pending_urls")
+            self.conn.execute("ALTER TABLE urls RENAME TO old_urls")
+            self.conn.execute(
+                "CREATE TABLE urls ("
+                "urlhash BLOB PRIMARY KEY, url TEXT NOT NULL, "
+                "completed INTEGER NOT NULL DEFAULT 0)")
+            self.conn.execute(
+                "INSERT INTO urls (urlhash, url, completed) "
+                "SELECT urlhash(url), normalize(url), completed FROM old_urls "
+                "WHERE true ORDER BY rowid ON CONFLICT(urlhash) "
+                "DO UPDATE SET completed = max(completed, excluded.completed)")
+            self.conn.execute("DROP TABLE old_urls")
+
+    def __contains__(self, urlhash):
+        with self.lock:
+            if urlhash in self.buffer:
+                return True
+            return self.conn.execute(
+                "SELECT 1 FROM urls WHERE urlhash = ?",
+                (urlhash,)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            self.flush()
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def __bool__(self):
+        with self.lock:
+            if self.buffer:
+                return True
+            return self.conn.execute(
+                "SELECT 1 FROM urls LIMIT 1").fetchone() is not None
+
+    def pending(self, batch_size=1000):
+        ''' Yields lists of pending urls, in discovery order, read through a
+        separate connection so writers are not blocked while they stream.
+        Only urls saved before the call are yielded; urls added while it
+        streams were already queued by whoever added them. '''
+        with self.lock:
+            self.flush()
+            max_rowid = self.conn.execute(
+                "SELECT max(rowid) FROM urls").fetchone()[0] or 0
+        # The bound is taken now, not when the caller starts iterating.
+        return self._pending(max_rowid, batch_size)
+
+    def _pending(self, max_rowid, batch_size):
+        conn = sqlite3.connect(self.path)
+        try:
+            last_rowid = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT rowid, url FROM urls INDEXED BY pending_urls "
+                    "WHERE completed = 0 AND rowid > ? AND rowid <= ? "
+                    "ORDER BY rowid LIMIT ?",
+                    (last_rowid, max_rowid, batch_size)).fetchall()
+                if not rows:
+                    return
+                last_rowid = rows[-1][0]
+                yield [url for _, url in rows]
+        finally:
+            conn.close()
+
+    def values(self):
+        ''' Yields (url, completed) for every url in the store. '''
+        with self.lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT url, completed FROM urls").fetchall()
+        for url, completed in rows:
+            yield url, bool(completed)
+
+    def trap_templates(self):
+        ''' Yields (template, (discovered, fetched, novel, blocked)) saved by
+        the trap detector. '''
+        with self.lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT template, discovered, fetched, novel, blocked "
+                "FROM trap_templates").fetchall()
+        for template, *counts in rows:
+            yield template, tuple(counts)
+
+    def set_trap_template(self, template, counts):
+        ''' Buffers a template's counts; written with the next flush. '''
+        with self.lock:
+            self.template_buffer[template] = counts
+
+    def forwarded(self):
+        ''' Yields every url a sharded crawl forwarded to another shard. '''
+        with self.lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT url FROM forwarded ORDER BY rowid").fetchall()
+        for url, in rows:
+            yield url
+
+    def add_forwarded(self, urlhash, url):
+        ''' Buffers a url forwarded to another shard; written with the next
+        flush, so never after the completion of the page it was found on. '''
+        with self.lock:
+            self.forward_buffer[urlhash] = url
+
+    def __setitem__(self, urlhash, value):
+        url, completed = value
+        with self.lock:
+            self.buffer[urlhash] = (url, completed)
+            if (len(self.buffer) >= self.flush_count
+                    or time.monotonic() - self.last_flush
+                    >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        ''' Writes all buffered updates in one transaction. '''
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if (not self.buffer and not self.template_buffer
+                    and not self.forward_buffer):
+                return
+            rows = [
+                (urlhash, url, int(completed))
+                for urlhash, (url, completed) in self.buffer.items()]
+            templates = [
+                (template, *counts)
+                for template, counts in self.template_buffer.items()]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO urls (urlhash, url, completed) "
+                    "VALUES (?, ?, ?) ON CONFLICT(urlhash) "
+                    "DO UPDATE SET completed = excluded.completed", rows)
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO trap_templates "
+                    "VALUES (?, ?, ?, ?, ?)", templates)
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO forwarded (urlhash, url) "
+                    "VALUES (?, ?)", self.forward_buffer.items())
+            self.buffer.clear()
+            self.template_buffer.clear()
+            self.forward_buffer.clear()
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._stopped.set()
+        with self.lock:
+            self.flush()
+            self.conn.close()
@@ -0,0 +1,220 @@
+import copy
+import time
+import multiprocessing
+
+from queue import Empty
+from hashlib import blake2b
+from functools import partial
+from threading import Thread, Lock
+from multiprocessing.connection import wait
+from urllib.parse import urlparse
+
+from utils import get_logger, get_urlhash, normalize, shard_path
+from utils.log import flush_logs
+from utils.seen_set import SeenSet
+import scraper
+from crawler import Crawler
+from crawler.frontier import Frontier
+from crawler.worker import Worker
+
+
+def shard_of(url, shards):
+    ''' Shard that owns the url's host. Stable across processes, unlike
+    hash(), so every shard agrees on it. '''
+    host = urlparse(url).netloc.lower().encode("utf-8")
+    return int.from_bytes(
+        blake2b(host, digest_size=8).digest(), "big") % shards
+
+
+class ShardedFrontier(Frontier):
+    ''' Frontier for the hosts of one shard of a sharded crawl.
+
+    Urls of other shards' hosts are forwarded to their owner in batches
+    through its inbox queue. Since every host lives in exactly one shard, the
+    per host politeness of Frontier still holds across processes.
+
+    outstanding is a counter shared by all shards: the number of shards with
+    local work plus the number of forwarded urls not yet taken in by their
+    owner. A url is counted before its parent page stops counting, so the
+    counter only reaches zero once the whole crawl is done.
+
+    Forwarded urls are also written to the sender's save file, in the same
+    group commit as the completion of the page they were found on or an
+    earlier one. A resumed shard forwards all of them again, and owners
+    drop the ones they already have, so urls in transit during a crash are
+    not lost. '''
+
+    FORWARD_BATCH = 100
+    # Seconds a partial batch may wait before it is forwarded anyway.
+    FORWARD_INTERVAL = 0.5
+
+    def __init__(self, config, restart, shard_id, inboxes, outstanding):
+        self.shard_id = shard_id
+        self.inboxes = inboxes
+        self.outstanding = outstanding
+        # Every shard starts out counted as busy, see ShardedCrawler.
+        self.busy = True
+        self.outboxes = [list() for _ in inboxes]
+        self.forward_lock = Lock()
+        # Links to other shards repeat a lot; only forward each one once.
+        self.forwarded = SeenSet(error_rate=config.seen_error_rate)
+        super().__init__(config, restart)
+        if not restart:
+            for url in self.save.forwarded():
+                if self.forwarded.add(url):
+                    self._forward(shard_of(url, len(inboxes)), url)
+        Thread(target=self._receive, daemon=True).start()
+        Thread(target=self._forward_loop, daemon=True).start()
+        with self.lock:
+            self._update_busy()
+
+    def _add_outstanding(self, count):
+        with self.outstanding.get_lock():
+            self.outstanding.value += count
+
+    def _update_busy(self):
+        # Called with the lock held after anything that changes local work.
+        busy = bool(self.queued or self.in_flight or self.loading)
+        if busy != self.busy:
+            self.busy = busy
+            self._add_outstanding(1 if busy else -1)
+
+    def _load_pending(self, batches):
+        super()._load_pending(batches)
+        with self.lock:
+            self._update_busy()
+
+    def _finished(self):
+        # Popping may have dropped the last queued urls as traps.
+        self._update_busy()
+        return super()._finished() and self.outstanding.value == 0
+
+    def add_url(self, url):
+        url = normalize(url)
+        shard_id = shard_of(url, len(self.inboxes))
+        if shard_id == self.shard_id:
+            with self.lock:
+                super().add_url(url)
+                self._update_busy()
+        elif self.forwarded.add(url):
+            self.save.add_forwarded(get_urlhash(url), url)
+            self._forward(shard_id, url)
+
+    def _forward(self, shard_id, url):
+        self._add_outstanding(1)
+        with self.forward_lock:
+            batch = self.outboxes[shard_id]
+            batch.append(url)
+            if len(batch) >= self.FORWARD_BATCH:
+                self.inboxes[shard_id].put(batch)
+                self.outboxes[shard_id] = list()
+
+    def _forward_loop(self):
+        while True:
+            time.sleep(self.FORWARD_INTERVAL)
+            with self.forward_lock:
+                for shard_id, batch in enumerate(self.outboxes):
+                    if batch:
+                        self.inboxes[shard_id].put(batch)
+                        self.outboxes[shard_id] = list()
+
+    def _receive(self):
+        inbox = self.inboxes[self.shard_id]
+        while True:
+            urls = inbox.get()
+            with self.lock:
+                for url in urls:
+                    Frontier.add_url(self, url)
+                self._update_busy()
+            # Only stop counting the urls once they count as local work.
+            self._add_outstanding(-len(urls))
+
+    def mark_url_complete(self, url, latency=None):
+        with self.lock:
+            super().mark_url_complete(url, latency)
+            self._update_busy()
+
+    def mark_url_failed(self, url, latency=None):
+        with self.lock:
+            super().mark_url_failed(url, latency)
+            self._update_busy()
+
+
+def shard_config(config, shard_id):
+    ''' Copy of config with the files and ports a shard must not share with
+    the other shards: its save file, exact seen set files and metrics port. '''
+    config = copy.copy(config)
+    config.save_file = shard_path(config.save_file, shard_id)
+    if config.seen_exact_file:
+        config.seen_exact_file = shard_path(config.seen_exact_file, shard_id)
+    if config.metrics_port:
+        config.metrics_port += shard_id
+    return config
+
+
+def run_shard(shard_id, config, restart, worker_factory, inboxes,
+              outstanding, results):
+    ''' Entry point of a shard process: crawls the shard's hosts with its
+    own save file, checkpoint and report files, and sends back the
+    rejection counts, which are not checkpointed. '''
+    config = shard_config(config, shard_id)
+    scraper.load_shard(shard_id)
+    frontier_factory = partial(
+        ShardedFrontier, shard_id=shard_id, inboxes=inboxes,
+        outstanding=outstanding)
+    crawler = Crawler(
+        config, restart, frontier_factory=frontier_factory,
+        worker_factory=worker_factory)
+    crawler.start()
+    results.put(scraper.stats.rejections())
+    # Children exit without running atexit handlers.
+    flush_logs()
+
+
+class ShardedCrawler(object):
+    ''' Runs config.shards crawler processes, each owning the hosts that
+    hash to it, and merges their statistics into the usual report files
+    once all of them are done. A shard keeps its hosts across restarts, so
+    SHARDS must not change while resuming a crawl. '''
+
+    def __init__(self, config, restart, worker_factory=Worker):
+        self.config = config
+        self.restart = restart
+        self.worker_factory = worker_factory
+        self.logger = get_logger("CRAWLER")
+
+    def start(self):
+        shards = self.config.shards
+        inboxes = [multiprocessing.Queue() for _ in range(shards)]
+        outstanding = multiprocessing.Value("q", shards)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=run_shard, name=f"Shard-{shard_id}",
+                args=(shard_id, self.config, self.restart,
+                      self.worker_factory, inboxes, outstanding, results))
+            for shard_id in range(shards)]
+        for process in processes:
+            process.start()
+
+        remaining = {process.sentinel: process for process in processes}
+        while remaining:
+            for sentinel in wait(list(remaining)):
+                process = remaining.pop(sentinel)
+                process.join()
+                if process.exitcode != 0:
+                    # The others would wait forever for its urls.
+                    self.logger.error(
+                        f"{process.name} exited with {process.exitcode}, "
+                        f"stopping the other shards.")
+                    for other in remaining.values():
+                        other.terminate()
+
+        rejections = list()
+        for _ in range(shards):
+            try:
+                rejections.append(results.get(timeout=1))
+            except Empty:
+                break
+        scraper.load_stats(self.config)
+        scraper.merge_shards(shards, rejections)
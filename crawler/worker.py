@@ -1,16 +1,26 @@
+import time
 from threading import Thread
 
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.log import PER_URL, set_rate_limit
+from utils.metrics import metrics
+from urllib.parse import urlparse
 import scraper
-import time
 from scraper import save_data
 
 
+def is_transient_failure(resp):
+    # Server errors, and the status 500 download returns on timeouts and
+    # connection errors, are worth retrying later.
+    return 500 <= resp.status < 600
+
+
 class Worker(Thread):
     def __init__(self, worker_id, config, frontier):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
+        set_rate_limit(self.logger, config.log_url_rate)
         self.config = config
         self.frontier = frontier
         # basic check for requests in scraper
@@ -20,19 +30,35 @@ class Worker(Thread):
         
     def run(self):
         while True:
-            tbd_url = self.frontier.get_tbd_url()
+            with metrics.timer("politeness_wait"):
+                tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            failed = False
+            latency = None
+            try:
+                start = time.monotonic()
+                with metrics.timer("download", urlparse(tbd_url).netloc):
+                    resp = download(tbd_url, self.config, self.logger)
+                latency = time.monotonic() - start
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.", extra=PER_URL)
+                failed = is_transient_failure(resp)
+                if not failed:
+                    scraped_urls = scraper.scraper(tbd_url, resp)
+                    with metrics.timer("frontier"):
+                        for scraped_url in scraped_urls:
+                            self.frontier.add_url(scraped_url)
+            finally:
+                # Politeness is enforced per host by the frontier, which only
+                # hands out this host again after its (adaptive) delay.
+                if failed:
+                    self.frontier.mark_url_failed(tbd_url, latency)
+                else:
+                    self.frontier.mark_url_complete(tbd_url, latency)
+                metrics.count("pages")
         
         # Saving the data that I created in scraper, we can just print the data, but it would be better to save it in a file
         self.logger.info("Crawling finished. Saving data...")
@@ -4,6 +4,9 @@ from argparse import ArgumentParser
 from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
+from crawler.sharding import ShardedCrawler
 
 
 def main(config_file, restart):
@@ -11,7 +14,11 @@ def main(config_file, restart):
     cparser.read(config_file)
     config = Config(cparser)
     config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    worker_factory = AsyncWorker if config.download_mode == "async" else Worker
+    if config.shards > 1:
+        crawler = ShardedCrawler(config, restart, worker_factory=worker_factory)
+    else:
+        crawler = Crawler(config, restart, worker_factory=worker_factory)
     crawler.start()
 
 
@@ -1,10 +1,22 @@
 import re
 import os
 import json
+import time
 import hashlib
-from urllib.parse import urlparse, urljoin, urldefrag, parse_qs
-from collections import defaultdict, Counter
-from lxml import html
+import multiprocessing
+from urllib.parse import urlparse, urljoin, urldefrag
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from lxml import etree
+
+from utils import normalize, shard_path
+from utils.url_filter import UrlFilter
+from utils.stats import CrawlStats
+from utils.seen_set import SeenSet
+from utils.checkpoint import Checkpoint
+from utils.simhash import simhash, SimHashIndex
+from utils.metrics import metrics
 
 # File paths for saved data
 UNIQUE_URLS_FILE = "unique_urls.txt"
@@ -12,113 +24,297 @@ PAGE_WORD_COUNT_FILE = "page_word_count.json"
 ALL_WORDS_FILE = "top_50_words.json"
 SUBDOMAINS_FILE = "subdomain_and_page_count.json"
 VISITED_HASHES_FILE = "visited_hashes.json"
+CHECKPOINT_FILE = "crawl_checkpoint.jsonl"
 
-# Crawler storage
-unique_urls = set()
-page_word_counts = {}  # {url: word_count}
-subdomains = defaultdict(set)  # {subdomain: set(urls)}
-word_frequencies = Counter()
-visited_hashes = {}  # {hash(content): url} to detect similar pages
-visited_urls = set()  # Stores URLs to detect loops
+# Crawler storage, safe to share between worker threads
+stats = CrawlStats()  # page count, word frequencies, page word counts, subdomains
+# Seen sets are Bloom filters, see load_seen_sets for the error rate
+unique_urls = SeenSet()
+visited_hashes = SeenSet()  # hash(raw bytes) to detect identical pages
+visited_urls = SeenSet()  # Stores URLs to detect loops
+near_duplicates = SimHashIndex()  # SimHash of accepted pages to detect near-identical pages
+
+# Incremental statistics log, compacted into the report files periodically
+checkpoint = Checkpoint(CHECKPOINT_FILE)
+save_lock = Lock()
 
 # Define allowed domains
 ALLOWED_DOMAINS = {"ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"}
 
-# Patterns that indicate loop-generating URLs
+# Patterns that indicate loop-generating URLs. They are combined into a single
+# regex, so a shared literal or character class up front keeps the scan cheap.
 BLOCKED_PATTERNS = [
-    r"git/\?p=.*;a=blobdiff",  # Avoid git blobdiff files
-    r"git/\?p=.*;a=blob_plain",  # Avoid redundant plaintext versions
-    r"git/\?p=.*;a=history",  # Avoid infinite history pages
-    r"git/\?p=.*;a=search",  # Avoid infinite search pages
-    r"git/\?p=.*;a=commit",  # Avoid endless commit history
-    r"git/\?p=.*;a=tree",  # Avoid tree views cycling indefinitely
+    # Git blobdiff, blob_plain, history, search, commit and tree views
+    # cycle indefinitely
+    r"git/\?p=.*;a=(?:blobdiff|blob_plain|history|search|commit|tree)",
+    # ICS Calendar trap and git URL loops
+    r"[?&](?:tribe-bar-date=\d{4}-\d{2}-\d{2}|a=(?:history|blobdiff|commit))",
+]
+
+# Extensions of urls that do not point to a webpage
+BLOCKED_EXTENSIONS = [
+    "css", "js", "bmp", "gif", "jpeg", "jpg", "ico",
+    "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+    "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+    "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names",
+    "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso",
+    "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv",
+    "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz",
 ]
 
-# Load stopwords (to filter common words)
-STOPWORDS_FILE = "stopwords.txt"
+# Compiled filter used by is_valid; load_url_filter replaces it from config
+url_filter = UrlFilter(ALLOWED_DOMAINS, BLOCKED_EXTENSIONS, BLOCKED_PATTERNS)
+
+# Load stopwords (to filter common words). Found next to this file, since parse_pool
+# processes import it again from whatever the working directory is by then
+STOPWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwords.txt")
 stopwords = set()
 if os.path.exists(STOPWORDS_FILE):
     with open(STOPWORDS_FILE, "r", encoding="utf-8") as f:
         stopwords = {line.strip().lower() for line in f if line.strip()}
 
-page_count = 0  # Track number of pages processed
+# Pages larger than this are not parsed
+MAX_PAGE_BYTES = 2_000_000
+# Content-Type values (substrings) of pages worth parsing; pages without one are parsed
+ALLOWED_CONTENT_TYPES = ("html", "xml", "text/plain")
+PARSE_CHUNK_SIZE = 64 * 1024
+
+# Optional process pool for parse_page, see start_parse_pool
+parse_pool = None
+# Frontier's url template trap detector, see load_trap_detector
+trap_detector = None
+
+
+def check_size(url, resp):
+    # Replies over the download size cap were never read, let alone decoded
+    return not resp.oversized
+
+
+def check_status(url, resp):
+    # Only successful responses with a body are processed. Status, headers
+    # and body are read without unpickling the whole requests.Response
+    return resp.status == 200 and bool(resp.content)
+
+
+def check_url(url, resp):
+    # Prevent crawling the same page multiple times that leads from different query string variations
+    if not visited_urls.add(normalize(url)):
+        return False
+
+    # Prevent known cyclic URL patterns
+    if url_filter.is_trap(url):
+        return False
+
+    if not unique_urls.add(url):
+        return False
+    stats.record_url(url)
+    return True
+
+
+def check_headers(url, resp):
+    # Skipping non-html and large files before spending any time on their content
+    headers = resp.headers
+    content_type = headers.get("Content-Type", "").lower()
+    if content_type and not any(allowed in content_type for allowed in ALLOWED_CONTENT_TYPES):
+        return False
+    content_length = headers.get("Content-Length", "")
+    if content_length.isdigit() and int(content_length) > MAX_PAGE_BYTES:
+        return False
+    return len(resp.content) <= MAX_PAGE_BYTES
+
+
+def check_duplicate(url, resp):
+    # Avoiding exact duplicate pages by hashing the raw bytes before parsing them
+    return visited_hashes.add(hashlib.md5(resp.content).hexdigest())
+
+
+# Rejections that tell the trap detector a page had nothing new
+NOT_NOVEL_STAGES = {"duplicate", "low_content", "near_duplicate"}
+
+# Filters run in order before a page is parsed; the first that fails rejects
+# the page and is counted in stats.rejections under its stage name
+PAGE_FILTERS = [
+    ("too_large", check_size),
+    ("status", check_status),
+    ("url", check_url),
+    ("headers", check_headers),
+    ("duplicate", check_duplicate),
+]
+
+
+def reject(url, stage):
+    # Counts a rejected page, and tells the trap detector when its content was not new
+    stats.record_rejection(stage)
+    if trap_detector is not None and stage in NOT_NOVEL_STAGES:
+        trap_detector.record(url, False)
+    return []
 
 
 def scraper(url, resp):
     """Processes a page, extracts valid links, and tracks statistics."""
-    global page_count
     try:
-        if resp.status != 200 or not resp.raw_response or not resp.raw_response.content:
-            return []
-
         url, _ = urldefrag(url)
-        parsed_url = urlparse(url)
-
-        # Prevent crawling the same page multiple times that leads from different query string variations
-        normalized_url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}"
-        query_params = frozenset(parse_qs(parsed_url.query).items())
-        if (normalized_url, query_params) in visited_urls:
-            return []
-        visited_urls.add((normalized_url, query_params))
-
-        # Prevent known cyclic URL patterns
-        for pattern in BLOCKED_PATTERNS:
-            if re.search(pattern, url):
-                return []
-
-        if url in unique_urls:
-            return []
-        unique_urls.add(url)
-
-        tree = html.fromstring(resp.raw_response.content)
-        for element in tree.xpath("//script | //style | //noscript"):
-            element.getparent().remove(element)
-
-        text = " ".join(tree.xpath("//body//text()"))
-        words = re.findall(r"\b[A-Za-z]{2,}\b", text.lower())
-        filtered_words = [word for word in words if word not in stopwords]
-        word_frequencies.update(filtered_words)
-        word_count = len(filtered_words)
-        page_word_counts[url] = word_count
-
-        # Avoiding duplicate pages by storing and checking content using hashes
-        page_hash = hashlib.md5(text.encode()).hexdigest()
-        if page_hash in visited_hashes:
-            return []
-        visited_hashes[str(page_hash)] = url
-        
+        for stage, check in PAGE_FILTERS:
+            if not check(url, resp):
+                return reject(url, stage)
+
+        # Parse time includes tokenizing, which parse_page also times on its own
+        with metrics.timer("parse"):
+            if parse_pool is not None:
+                # Parse in a separate process so it does not hold the GIL
+                parsed = parse_pool.submit(parse_page, url, resp.body).result()
+            else:
+                parsed = parse_page(url, resp.body)
+        if parsed is None:
+            return reject(url, "too_large")
+        links, page_words, fingerprint, tokenize_seconds = parsed
+        metrics.observe("tokenize", tokenize_seconds)
+
+        stats.record_words(url, page_words)
+
         # Skipping low-content pages by measuring the word count in the page
-        if word_count < 50:
-            return []
-        
-        # Skipping large file
-        if len(resp.raw_response.content) > 2_000_000:
-            return []
-
-        if parsed_url.netloc.endswith("ics.uci.edu"):
-            subdomains[parsed_url.netloc].add(url)
-
-        page_count += 1
-        if page_count % 100 == 0:
+        if sum(page_words.values()) < 50:
+            return reject(url, "low_content")
+
+        # Skipping pages that only differ from a crawled page by a few words (dates, counters)
+        if not near_duplicates.add(fingerprint):
+            return reject(url, "near_duplicate")
+
+        if trap_detector is not None:
+            trap_detector.record(url, True)
+
+        netloc = urlparse(url).netloc
+        subdomain = netloc if netloc.endswith("ics.uci.edu") else None
+        if stats.record_page(url, subdomain) % 100 == 0:
             save_data(append=True)
 
-        links = extract_next_links(url, tree)
         return [link for link in links if is_valid(link)]
 
     except Exception as e:
         print(f"Error in scraper: {e}")
-        return []
-
-
-def extract_next_links(url, tree):
-    # Extracts and normalizes valid links from a page.
+        return reject(url, "error")
+
+
+class PageTarget(object):
+    """lxml parser target that collects body text and hrefs in one pass.
+
+    Text inside script, style and noscript is skipped by tracking how deep
+    the parser is inside them, so the tree is never built or mutated."""
+
+    SKIPPED_TAGS = {"script", "style", "noscript"}
+
+    def __init__(self):
+        self.skip_depth = 0
+        self.body_depth = 0
+        self.text = []
+        self.hrefs = []
+
+    def start(self, tag, attrib):
+        if tag in self.SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == "body":
+            self.body_depth += 1
+        elif tag == "a" and not self.skip_depth and attrib.get("href") is not None:
+            self.hrefs.append(attrib["href"])
+        # Separate text nodes like the old " ".join of //body//text()
+        self.text.append(" ")
+
+    def end(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self.skip_depth -= 1
+        elif tag == "body":
+            self.body_depth -= 1
+        self.text.append(" ")
+
+    def data(self, data):
+        if self.body_depth and not self.skip_depth:
+            self.text.append(data)
+
+    def close(self):
+        return self
+
+
+def parse_page(url, content, max_bytes=MAX_PAGE_BYTES):
+    """Parses raw page bytes into (links, word Counter, SimHash, seconds
+    spent tokenizing).
+
+    content is bytes or an iterable of byte chunks. It is fed to a streaming
+    lxml parser a chunk at a time and parsing stops with None as soon as
+    more than max_bytes have been seen. Only depends on its arguments and
+    the stopwords, so it can run in a parse_pool process; the caller merges
+    the result into the statistics and records the tokenize time, since
+    metrics observed in a pool process would never reach the crawler."""
+    chunks = content
+    if isinstance(content, bytes):
+        chunks = (content[start:start + PARSE_CHUNK_SIZE] for start in range(0, len(content), PARSE_CHUNK_SIZE))
+    target = PageTarget()
+    parser = etree.HTMLParser(target=target)
+    fed = 0
+    for chunk in chunks:
+        fed += len(chunk)
+        if fed > max_bytes:
+            return None
+        parser.feed(chunk)
+    parser.close()
+
+    start = time.perf_counter()
+    text = "".join(target.text)
+    words = re.findall(r"\b[A-Za-z]{2,}\b", text.lower())
+    page_words = Counter(word for word in words if word not in stopwords)
+    tokenize_seconds = time.perf_counter() - start
+    return extract_next_links(url, target.hrefs), page_words, simhash(page_words), tokenize_seconds
+
+
+def load_seen_sets(config):
+    # Rebuilds the seen sets with the configured false positive rate, and
+    # an exact on-disk fallback if SEENEXACTFILE is set
+    global unique_urls, visited_hashes, visited_urls
+    seen_sets = []
+    for name in ("unique_urls", "visited_hashes", "visited_urls"):
+        exact_path = f"{config.seen_exact_file}.{name}" if config.seen_exact_file else None
+        seen_sets.append(SeenSet(error_rate=config.seen_error_rate, exact_path=exact_path))
+    unique_urls, visited_hashes, visited_urls = seen_sets
+
+
+def seen_set_report():
+    # One line memory usage summary of the seen sets
+    report = []
+    for name, seen in (("unique_urls", unique_urls), ("visited_hashes", visited_hashes), ("visited_urls", visited_urls)):
+        keys, size, error_rate = seen.memory_usage()
+        report.append(f"{name}: {keys} keys in {size / 1024:.0f} KiB, false positives <= {error_rate:.2g}")
+    return "; ".join(report)
+
+
+def load_near_duplicate_index(config):
+    # Sizes the near-duplicate index from the config
+    global near_duplicates
+    near_duplicates = SimHashIndex(config.near_duplicate_distance, config.near_duplicate_capacity)
+
+
+def start_parse_pool(processes):
+    # Moves parse_page into a pool of worker processes. The pool is created
+    # once threads (logging, metrics, frontier) are already running, so its
+    # processes come from a forkserver and never inherit a held lock
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    global parse_pool
+    parse_pool = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+
+
+def stop_parse_pool():
+    global parse_pool
+    if parse_pool is not None:
+        parse_pool.shutdown()
+        parse_pool = None
+
+
+def extract_next_links(url, hrefs):
+    # Extracts and normalizes valid links from a page's hrefs.
     try:
         links = set()
-        for link in tree.xpath("//a/@href"):
+        for link in hrefs:
             full_url, _ = urldefrag(urljoin(url, link))  # Normalizing & removing fragments
-            # Skip event pages with dates in URLs
-            if re.search(r"(\?|&)tribe-bar-date=\d{4}-\d{2}-\d{2}", full_url):
-                continue
             links.add(full_url)
         return list(links)
     except Exception as e:
@@ -129,51 +325,95 @@ def extract_next_links(url, tree):
 def is_valid(url):
     """Determines if a URL should be crawled."""
     try:
-        parsed = urlparse(url)
-        if parsed.scheme not in {"http", "https"}:
-            return False
-
-        if parsed.netloc not in ALLOWED_DOMAINS and not parsed.netloc.endswith(tuple(ALLOWED_DOMAINS)):
-            return False
-
-        # Detecting Looping URLs like calendars
-        if re.search(r"(\?|&)tribe-bar-date=\d{4}-\d{2}-\d{2}", url):  # ICS Calendar trap
-            return False
-
-        if re.search(r"(\?|&)(a=history|a=blobdiff|a=commit)", url):  # Git URL loops
-            return False
-
-        return not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$",
-            parsed.path.lower(),
-        )
-    except TypeError:
-        print(f"TypeError for {parsed}")
+        return url_filter.is_valid(url)
+    except (TypeError, ValueError):
+        print(f"Invalid url {url}")
         return False
 
 
-def save_data(append=False):
-    # Saves collected data to files for analysis
-    mode = "a" if append else "w"
-
-    with open(UNIQUE_URLS_FILE, mode, encoding="utf-8") as f:
-        for url in unique_urls:
-            f.write(url + "\n")
-
-    with open(PAGE_WORD_COUNT_FILE, "w", encoding="utf-8") as f:
-        json.dump(page_word_counts, f, indent=4)
+def load_url_filter(config):
+    # Rebuilds the url filter from the optional [FILTER] section of the config
+    global url_filter
+    url_filter = UrlFilter.from_config(
+        config, ALLOWED_DOMAINS, BLOCKED_EXTENSIONS, BLOCKED_PATTERNS)
+
+
+def load_trap_detector(detector):
+    # Pages fetched are fed back to the frontier's trap detector, None disables it
+    global trap_detector
+    trap_detector = detector
+
+
+def load_stats(config):
+    # Bounds the word frequency counters, must run before load_checkpoint
+    global stats
+    stats = CrawlStats(word_capacity=config.top_words_capacity or None)
+
+
+def load_checkpoint(restart):
+    # Restores statistics from a previous run, or clears them on restart
+    if restart:
+        checkpoint.remove()
+        if os.path.exists(UNIQUE_URLS_FILE):
+            os.remove(UNIQUE_URLS_FILE)
+    else:
+        stats.restore(*checkpoint.load())
+
+
+def load_shard(shard_id):
+    # Gives a crawl shard its own checkpoint and report files, must run before load_checkpoint
+    global UNIQUE_URLS_FILE, PAGE_WORD_COUNT_FILE, ALL_WORDS_FILE, SUBDOMAINS_FILE, CHECKPOINT_FILE, checkpoint
+    UNIQUE_URLS_FILE = shard_path(UNIQUE_URLS_FILE, shard_id)
+    PAGE_WORD_COUNT_FILE = shard_path(PAGE_WORD_COUNT_FILE, shard_id)
+    ALL_WORDS_FILE = shard_path(ALL_WORDS_FILE, shard_id)
+    SUBDOMAINS_FILE = shard_path(SUBDOMAINS_FILE, shard_id)
+    CHECKPOINT_FILE = shard_path(CHECKPOINT_FILE, shard_id)
+    checkpoint = Checkpoint(CHECKPOINT_FILE)
+
+
+def merge_shards(shard_count, rejections=()):
+    # Folds every shard's checkpoint, url list and rejection counts into this
+    # process's statistics and writes the combined report files
+    with open(UNIQUE_URLS_FILE, "w", encoding="utf-8") as out:
+        for shard_id in range(shard_count):
+            path = shard_path(UNIQUE_URLS_FILE, shard_id)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    out.writelines(f)
+    for shard_id in range(shard_count):
+        stats.restore(*Checkpoint(shard_path(CHECKPOINT_FILE, shard_id)).load())
+    for shard_rejections in rejections:
+        stats.restore(0, {}, {}, {}, shard_rejections)
+    # The combined checkpoint is rebuilt from the shard totals
+    checkpoint.remove()
+    save_data()
 
-    with open(ALL_WORDS_FILE, "w", encoding="utf-8") as f:
-        json.dump(word_frequencies.most_common(50), f, indent=4)
 
-    with open(SUBDOMAINS_FILE, "w", encoding="utf-8") as f:
-        json.dump({subdomain: len(urls) for subdomain, urls in subdomains.items()}, f, indent=4)
-
-    print("\nData successfully saved!")
\ No newline at end of file
+def save_data(append=False):
+    # Appends the statistics gathered since the last save to the checkpoint.
+    # A final save, or every checkpoint.compact_every appends, compacts the
+    # checkpoint and rewrites the report files.
+    with save_lock:
+        delta = stats.take_delta()
+        with open(UNIQUE_URLS_FILE, "a", encoding="utf-8") as f:
+            for url in delta.new_urls:
+                f.write(url + "\n")
+        checkpoint.append(delta)
+        if append and not checkpoint.needs_compaction():
+            return
+
+        page_count, word_frequencies, page_word_counts, subdomain_counts = stats.snapshot()
+        checkpoint.compact(page_count, word_frequencies, page_word_counts, subdomain_counts)
+
+        with open(PAGE_WORD_COUNT_FILE, "w", encoding="utf-8") as f:
+            json.dump(page_word_counts, f, indent=4)
+
+        with open(ALL_WORDS_FILE, "w", encoding="utf-8") as f:
+            json.dump(stats.top_words(50), f, indent=4)
+
+        with open(SUBDOMAINS_FILE, "w", encoding="utf-8") as f:
+            json.dump(subdomain_counts, f, indent=4)
+
+    print("\nData successfully saved!")
+    print(seen_set_report())
+    print("Rejected pages by stage: " + ", ".join(f"{stage}={count}" for stage, count in stats.rejections().items()))
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import sys
+import random
+import tempfile
+import unittest
+import importlib.util
+
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load(name):
+    spec = importlib.util.spec_from_file_location(
+        name.replace("-", "_"), os.path.join(ROOT, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so the multiprocessing pool can pickle its functions.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+PartA = load("Assignment1-PartA")
+PartB = load("Assignment1-PartB")
+
+# Invalid bytes are dropped, so they join the letters around them, and
+# some non-ASCII characters lowercase to ASCII letters.
+CASES = [
+    b"ab\xffcd",
+    "Kelvin".encode(),
+    "İstanbul".encode(),
+    "café naïve déjà-vu".encode(),
+    b"didn't stop \xe2\x84 here",
+    b"split\xe2\x84\xaa\xe2\x84\xaa word",
+]
+
+
+def random_text(seed, size=4000):
+    rng = random.Random(seed)
+    pieces = [b"a", b"Z", b"7", b" ", b"'", b"\n", b"\xff", b"\x84", b"\xe2",
+              "K".encode(), "İ".encode(), "é".encode(),
+              "中".encode(), "\U0001f600".encode()]
+    return b"".join(rng.choice(pieces) for _ in range(size))
+
+
+class Files(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.count = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, data):
+        self.count += 1
+        path = os.path.join(self.tmp.name, f"{self.count}.txt")
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def samples(self):
+        return CASES + [random_text(seed) for seed in range(5)]
+
+
+class PartATest(Files):
+    def frequencies(self, path):
+        return PartA.computeWordFrequencies(PartA.tokenize(path))
+
+    def test_ranges_match_tokenize(self):
+        for data in self.samples():
+            path = self.write(data)
+            expected = self.frequencies(path)
+            for chunk_size in (1, 2, 3, 7, 1 << 20):
+                for parts in (1, 2, 5):
+                    counts = Counter()
+                    for i in range(parts):
+                        counts.update(PartA.countTokensInRange(
+                            path, len(data) * i // parts,
+                            len(data) * (i + 1) // parts, chunk_size))
+                    self.assertEqual(
+                        dict(counts), expected, (data, chunk_size, parts))
+
+    def test_streaming_matches_default_mode(self):
+        path = self.write(b" ".join(CASES) + random_text(20, 20000))
+        for processes in (1, 3):
+            self.assertEqual(
+                PartA.computeWordFrequenciesStreaming(path, processes, 64),
+                self.frequencies(path))
+
+
+class PartBTest(Files):
+    def common(self, path1, path2):
+        return len(set(PartB.tokenize(path1)) & set(PartB.tokenize(path2)))
+
+    def test_token_chunks_match_tokenize(self):
+        for data in self.samples():
+            path = self.write(data)
+            for chunk_size in (1, 2, 3, 7, 1 << 20):
+                chunks = PartB.iterTokenChunks(path, chunk_size)
+                self.assertEqual(
+                    set().union(*chunks), set(PartB.tokenize(path)),
+                    (data, chunk_size))
+
+    def test_common_tokens_match_memory_mode(self):
+        path1 = self.write(b" ".join(CASES) + random_text(10))
+        path2 = self.write(
+            b"abcd kelvin i stanbul caf " + random_text(11, 2000))
+        expected = self.common(path1, path2)
+        self.assertGreater(expected, 0)
+        for chunk_size in (1, 5, 1 << 20):
+            self.assertEqual(
+                PartB.countCommonTokensStreaming(path1, path2, chunk_size),
+                expected)
+            self.assertEqual(
+                PartB.countCommonTokensExternal(
+                    path1, path2, buckets=4, chunk_size=chunk_size),
+                expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
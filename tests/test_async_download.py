@@ -0,0 +1,67 @@
+import cbor
+import asyncio
+import unittest
+
+from utils.async_download import AsyncDownloader
+
+URL = "https://www.ics.uci.edu/"
+
+
+class Config(object):
+    def __init__(self, port):
+        self.cache_server = ("127.0.0.1", port)
+        self.user_agent = "test"
+        self.max_response_bytes = 1 << 20
+
+
+def reply(head, body=b""):
+    return b"HTTP/1.1 " + head + b"\r\n\r\n" + body
+
+
+class AsyncDownloaderTest(unittest.TestCase):
+    def download(self, *replies):
+        # Serves each reply to one request, in order, then downloads URL
+        # once per reply and returns the Responses.
+        async def run():
+            pending = list(replies)
+
+            async def serve(reader, writer):
+                while pending:
+                    while (await reader.readline()) not in (b"\r\n", b""):
+                        pass
+                    writer.write(pending.pop(0))
+                    await writer.drain()
+                writer.close()
+
+            server = await asyncio.start_server(serve, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            downloader = AsyncDownloader(Config(port), timeout=2)
+            try:
+                return [await downloader.download(URL) for _ in replies]
+            finally:
+                downloader.close()
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(run())
+
+    def test_page(self):
+        body = cbor.dumps({"url": URL, "status": 200})
+        resp, = self.download(reply(
+            b"200 OK\r\nContent-Length: " + str(len(body)).encode(), body))
+        self.assertEqual((resp.url, resp.status), (URL, 200))
+
+    def test_malformed_replies_fail_the_download(self):
+        malformed = [
+            reply(b"OK 200"),
+            reply(b"200 OK\r\nContent-Length: many"),
+            reply(b"200 OK\r\nContent-Length: -5"),
+            reply(b"200 OK\r\nTransfer-Encoding: chunked", b"zz\r\n"),
+        ]
+        for data in malformed:
+            resp, = self.download(data)
+            self.assertEqual(resp.status, 500, data)
+            self.assertIn("Malformed", resp.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import time
+import tempfile
+import unittest
+
+from collections import Counter
+
+from utils import get_urlhash
+from crawler.frontier import Frontier
+from crawler.frontier_store import FrontierStore
+
+
+class Config(object):
+    def __init__(self, save_file, seed_urls):
+        self.save_file = save_file
+        self.save_flush_count = 500
+        self.save_flush_interval = 5.0
+        self.seed_urls = seed_urls
+        self.time_delay = 0.0
+        self.max_retries = 3
+        self.max_backoff = 60.0
+        self.latency_factor = 1.0
+        self.trap_detection = False
+
+
+def page_url(i):
+    return f"https://host{i % 50}.ics.uci.edu/page/{i}"
+
+
+class PendingTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        # get_logger writes to ./Logs.
+        os.chdir(self.tmp.name)
+        self.path = os.path.join(self.tmp.name, "frontier.db")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write_pending(self, count):
+        save = FrontierStore(self.path)
+        for i in range(count):
+            url = page_url(i)
+            save[get_urlhash(url)] = (url, False)
+        save.close()
+
+    def test_pending_skips_urls_added_while_streaming(self):
+        self.write_pending(3000)
+        save = FrontierStore(self.path)
+        loaded = list()
+        for batch_number, urls in enumerate(save.pending(batch_size=500)):
+            loaded.extend(urls)
+            # Workers add and flush new urls while the loader streams.
+            for i in range(batch_number * 100, (batch_number + 1) * 100):
+                url = f"https://new.ics.uci.edu/{i}"
+                save[get_urlhash(url)] = (url, False)
+            save.flush()
+        save.close()
+        self.assertEqual(loaded, [page_url(i) for i in range(3000)])
+
+    def test_urls_added_while_loading_are_queued_once(self):
+        self.write_pending(5000)
+        seeds = [page_url(0), "https://seed.ics.uci.edu/"]
+        frontier = Frontier(Config(self.path, seeds), False)
+        added = [f"https://new.ics.uci.edu/{i}" for i in range(2000)]
+        for url in added:
+            frontier.add_url(url)
+            frontier.save.flush()
+        while frontier.loading:
+            time.sleep(0.01)
+        queued = Counter(
+            url for queue in frontier.host_queues.values() for url in queue)
+        frontier.save.close()
+        self.assertEqual(max(queued.values()), 1)
+        self.assertEqual(len(queued), 5000 + len(added))
+        self.assertEqual(frontier.queue_depth(), len(queued))
+
+
+if __name__ == "__main__":
+    unittest.main()
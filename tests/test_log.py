@@ -0,0 +1,60 @@
+import logging
+import unittest
+
+from unittest import mock
+
+from utils.log import PER_URL, RateLimitFilter
+
+
+def record(per_url=True):
+    record = logging.LogRecord(
+        "CRAWLER", logging.INFO, __file__, 0, "Downloaded a page", None, None)
+    if per_url:
+        record.__dict__.update(PER_URL)
+    return record
+
+
+class RateLimitFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("utils.log.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def passed(self, log_filter, seconds, per_second):
+        # Feeds per_second PER_URL records a second for seconds.
+        count = 0
+        for _ in range(round(seconds * per_second)):
+            self.now += 1 / per_second
+            count += log_filter.filter(record())
+        return count
+
+    def test_fractional_rate_lets_lines_through(self):
+        log_filter = RateLimitFilter(0.5)
+        self.assertTrue(log_filter.filter(record()))
+        # One line every 2 seconds.
+        self.assertAlmostEqual(self.passed(log_filter, 10, 20), 5, delta=1)
+
+    def test_rate_limits_per_url_lines(self):
+        log_filter = RateLimitFilter(10)
+        # The one second burst, then 10 a second.
+        self.assertAlmostEqual(
+            self.passed(log_filter, 5, 100), 10 + 5 * 10, delta=1)
+
+    def test_dropped_lines_are_noted(self):
+        log_filter = RateLimitFilter(1)
+        self.assertTrue(log_filter.filter(record()))
+        self.assertFalse(log_filter.filter(record()))
+        self.now += 1
+        line = record()
+        self.assertTrue(log_filter.filter(line))
+        self.assertIn("(1 similar lines dropped)", line.msg)
+
+    def test_other_lines_always_pass(self):
+        log_filter = RateLimitFilter(0.5)
+        for _ in range(100):
+            self.assertTrue(log_filter.filter(record(per_url=False)))
+
+
+if __name__ == "__main__":
+    unittest.main()
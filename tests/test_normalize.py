@@ -0,0 +1,65 @@
+import unittest
+
+from urllib.parse import urljoin
+
+from utils import get_urlhash, normalize
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_trailing_slash(self):
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu/about/"),
+            "https://www.ics.uci.edu/about")
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu/"), "https://www.ics.uci.edu")
+
+    def test_trailing_slash_is_kept_before_a_query(self):
+        url = normalize("https://www.ics.uci.edu/dir/?x=1")
+        self.assertEqual(url, "https://www.ics.uci.edu/dir/?x=1")
+        self.assertEqual(
+            urljoin(url, "page.html"), "https://www.ics.uci.edu/dir/page.html")
+
+    def test_trailing_slash_before_only_tracking_params(self):
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu/dir/?utm_source=mail"),
+            "https://www.ics.uci.edu/dir")
+
+    def test_scheme_host_and_default_ports(self):
+        self.assertEqual(
+            normalize("HTTPS://WWW.ICS.UCI.EDU:443/About"),
+            "https://www.ics.uci.edu/About")
+        self.assertEqual(
+            normalize("http://www.ics.uci.edu:80/a"), "http://www.ics.uci.edu/a")
+        self.assertEqual(
+            normalize("http://www.ics.uci.edu:443/a"),
+            "http://www.ics.uci.edu:443/a")
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu:8443/a"),
+            "https://www.ics.uci.edu:8443/a")
+
+    def test_fragment_is_dropped(self):
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu/a#section"),
+            "https://www.ics.uci.edu/a")
+
+    def test_tracking_params_are_removed(self):
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu/a?utm_source=x&id=3&fbclid=y"
+                      "&UTM_Medium=z&gclid=w"),
+            "https://www.ics.uci.edu/a?id=3")
+
+    def test_query_params_are_sorted(self):
+        self.assertEqual(
+            normalize("https://www.ics.uci.edu/a?b=2&a=1&c=3"),
+            "https://www.ics.uci.edu/a?a=1&b=2&c=3")
+        self.assertEqual(
+            get_urlhash(normalize("https://www.ics.uci.edu/a?b=2&a=1")),
+            get_urlhash(normalize("https://www.ics.uci.edu/a?a=1&b=2")))
+
+    def test_percent_encoding_is_left_as_is(self):
+        url = "https://www.ics.uci.edu/a%2Fb?q=%7E"
+        self.assertEqual(normalize(url), url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+import scraper
+
+PAGE = b"""<html><body><p>The history of the department and
+about its research in computing</p><a href="/faculty">Faculty</a></body></html>"""
+
+
+class ParsePageTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        # The crawl may run from a directory without stopwords.txt.
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        scraper.stop_parse_pool()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_stopwords_are_filtered(self):
+        links, words, _, _ = scraper.parse_page("https://www.ics.uci.edu/", PAGE)
+        self.assertEqual(links, ["https://www.ics.uci.edu/faculty"])
+        self.assertIn("research", words)
+        for stopword in ("the", "and", "of", "about"):
+            self.assertNotIn(stopword, words)
+
+    def test_parse_pool_matches_inline_parse(self):
+        inline = scraper.parse_page("https://www.ics.uci.edu/", PAGE)
+        scraper.start_parse_pool(1)
+        pooled = scraper.parse_pool.submit(
+            scraper.parse_page, "https://www.ics.uci.edu/", PAGE).result()
+        # Everything but the tokenize time.
+        self.assertEqual(pooled[:3], inline[:3])
+
+
+if __name__ == "__main__":
+    unittest.main()
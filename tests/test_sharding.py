@@ -0,0 +1,175 @@
+import os
+import time
+import queue
+import tempfile
+import unittest
+import multiprocessing
+
+from crawler.sharding import ShardedFrontier, shard_config, shard_of
+from utils.log import flush_logs
+from utils.seen_set import SeenSet
+
+
+class Config(object):
+    def __init__(self, directory):
+        self.save_file = os.path.join(directory, "frontier.db")
+        self.seen_exact_file = os.path.join(directory, "seen")
+        self.metrics_port = 9100
+
+
+def owned_by(shard_id, shards=2, count=1):
+    urls = list()
+    i = 0
+    while len(urls) < count:
+        url = f"https://host{i}.ics.uci.edu/page"
+        if shard_of(url, shards) == shard_id:
+            urls.append(url)
+        i += 1
+    return urls
+
+
+class FrontierConfig(object):
+    def __init__(self, directory, shard_id, seed_urls):
+        self.save_file = os.path.join(directory, f"frontier.shard{shard_id}.db")
+        self.save_flush_count = 500
+        self.save_flush_interval = 5.0
+        self.seed_urls = seed_urls
+        self.time_delay = 0.0
+        self.max_retries = 3
+        self.max_backoff = 60.0
+        self.latency_factor = 1.0
+        self.trap_detection = False
+        self.seen_error_rate = 0.0001
+
+
+class ShardedFrontierTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        # get_logger writes to ./Logs.
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        # Writes the queued log lines while still in the temporary directory.
+        flush_logs()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def frontier(self, shard_id, restart, inboxes, outstanding=None,
+                 seed_urls=None):
+        if outstanding is None:
+            outstanding = multiprocessing.Value("q", len(inboxes))
+        if seed_urls is None:
+            seed_urls = owned_by(shard_id)
+        frontier = ShardedFrontier(
+            FrontierConfig(self.tmp.name, shard_id, seed_urls), restart,
+            shard_id, inboxes, outstanding)
+        while frontier.loading:
+            time.sleep(0.01)
+        return frontier
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_outstanding_counts_busy_shards_and_urls_in_transit(self):
+        inboxes = [queue.Queue(), queue.Queue()]
+        outstanding = multiprocessing.Value("q", 2)
+        shard0 = self.frontier(0, True, inboxes, outstanding)
+        shard1 = self.frontier(1, True, inboxes, outstanding, seed_urls=[])
+        # Only shard 0 has work.
+        self.assertEqual(outstanding.value, 1)
+
+        parent, _ = shard0.poll_tbd_url()
+        child = owned_by(1)[0]
+        shard0.add_url(child)
+        self.assertEqual(outstanding.value, 2)
+        shard0.mark_url_complete(parent)
+        # The forwarded url keeps the crawl going until shard 1 has it.
+        self.assertEqual(outstanding.value, 1)
+        self.assertEqual(shard0.poll_tbd_url()[0], None)
+        self.assertNotEqual(shard0.poll_tbd_url()[1], None)
+
+        self.wait_for(lambda: shard1.queue_depth() == 1)
+        self.wait_for(lambda: outstanding.value == 1)
+        url, _ = shard1.poll_tbd_url()
+        self.assertEqual(url, child)
+        self.assertEqual(outstanding.value, 1)
+        shard1.mark_url_complete(url)
+        self.assertEqual(outstanding.value, 0)
+        self.assertEqual(shard0.poll_tbd_url(), (None, None))
+        self.assertEqual(shard1.poll_tbd_url(), (None, None))
+        shard0.save.close()
+        shard1.save.close()
+
+    def test_failed_url_keeps_its_shard_busy_until_given_up(self):
+        inboxes = [queue.Queue()]
+        outstanding = multiprocessing.Value("q", 1)
+        frontier = self.frontier(0, True, inboxes, outstanding)
+        frontier.config.max_retries = 1
+        url, _ = frontier.poll_tbd_url()
+        frontier.mark_url_failed(url)
+        self.assertEqual(outstanding.value, 1)
+        self.wait_for(lambda: frontier.poll_tbd_url()[0] == url)
+        frontier.mark_url_failed(url)
+        self.assertEqual(outstanding.value, 0)
+        self.assertEqual(frontier.poll_tbd_url(), (None, None))
+        frontier.save.close()
+
+    def test_forwarded_urls_survive_a_crash(self):
+        inboxes = [queue.Queue(), queue.Queue()]
+        frontier = self.frontier(0, True, inboxes)
+        parent = owned_by(0)[0]
+        children = owned_by(1, count=3)
+        frontier.add_url(parent)
+        for url in children:
+            frontier.add_url(url)
+        frontier.mark_url_complete(parent)
+        frontier.save.close()
+        # The crash loses the batch in the outbox and the inbox.
+        inboxes = [queue.Queue(), queue.Queue()]
+        frontier = self.frontier(0, False, inboxes)
+        self.assertEqual(inboxes[1].get(timeout=5), children)
+        frontier.save.close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = Config(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shards_get_their_own_files_and_ports(self):
+        configs = [shard_config(self.config, shard_id) for shard_id in range(3)]
+        for name in ("save_file", "seen_exact_file", "metrics_port"):
+            values = [getattr(config, name) for config in configs]
+            self.assertEqual(len(set(values)), 3, name)
+        self.assertTrue(configs[1].seen_exact_file.endswith("seen.shard1"))
+        # The shared config is left as it is.
+        self.assertTrue(self.config.save_file.endswith("frontier.db"))
+
+    def test_exact_seen_sets_of_shards_do_not_lock_each_other(self):
+        self.config.seen_exact_file += ".db"
+        seen_sets = list()
+        for shard_id in range(2):
+            path = shard_config(self.config, shard_id).seen_exact_file
+            seen = SeenSet(exact_path=f"{path}.unique_urls")
+            # Leaves a write transaction open, as a crawling shard does.
+            self.assertTrue(seen.add(f"https://shard{shard_id}.ics.uci.edu/"))
+            seen_sets.append(seen)
+        for seen in seen_sets:
+            self.assertTrue(seen.add("https://www.ics.uci.edu/"))
+            seen.conn.close()
+
+    def test_no_exact_seen_sets(self):
+        self.config.seen_exact_file = ""
+        self.config.metrics_port = 0
+        config = shard_config(self.config, 2)
+        self.assertEqual(config.seen_exact_file, "")
+        self.assertEqual(config.metrics_port, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+from crawler.frontier_store import FrontierStore
+from utils.trap_detector import TrapDetector
+
+CALENDAR = "https://www.ics.uci.edu/calendar/{}/{}"
+
+
+class TemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.detector = TrapDetector()
+
+    def template(self, url):
+        return self.detector.template(url)[0]
+
+    def test_numbers_dates_and_ids_become_placeholders(self):
+        self.assertEqual(
+            self.template("https://WWW.ics.uci.edu/calendar/2024/10"),
+            "www.ics.uci.edu/calendar/{n}/{n}")
+        self.assertEqual(
+            self.template("https://www.ics.uci.edu/events/2024-10-05/item"),
+            "www.ics.uci.edu/events/{date}/item")
+        self.assertEqual(
+            self.template("https://www.ics.uci.edu/~user/paper42.pdf"),
+            "www.ics.uci.edu/~user/{id}")
+
+    def test_query_keeps_sorted_names_only(self):
+        self.assertEqual(
+            self.template("https://www.ics.uci.edu/news/item?session=abc&id=3#top"),
+            "www.ics.uci.edu/news/item?id=&session=")
+        self.assertEqual(
+            self.template("https://www.ics.uci.edu/news/item?id=4&session=xyz"),
+            self.template("https://www.ics.uci.edu/news/item?session=abc&id=3"))
+
+    def test_non_http_urls_are_not_templated(self):
+        self.assertIsNone(self.detector.template("ftp://ftp.ics.uci.edu/pub"))
+        self.assertTrue(self.detector.allow("ftp://ftp.ics.uci.edu/pub"))
+
+
+class AllowTest(unittest.TestCase):
+    def test_deep_and_repeating_paths_are_refused(self):
+        detector = TrapDetector(max_depth=4, repeat_limit=3)
+        self.assertTrue(detector.allow("https://www.ics.uci.edu/a/b/c/d"))
+        self.assertFalse(detector.allow("https://www.ics.uci.edu/a/b/c/d/e"))
+        self.assertTrue(detector.allow("https://www.ics.uci.edu/a/b/a"))
+        self.assertFalse(detector.allow("https://www.ics.uci.edu/a/a/b/a"))
+
+    def test_template_is_throttled_past_its_budget(self):
+        detector = TrapDetector(budget=5)
+        allowed = [
+            detector.allow(CALENDAR.format(2024, day)) for day in range(1, 31)]
+        # The budget, then one url in THROTTLE.
+        self.assertEqual(allowed[:5], [True] * 5)
+        self.assertEqual(sum(allowed[5:]), 25 // TrapDetector.THROTTLE)
+        self.assertTrue(detector.allow("https://www.ics.uci.edu/about"))
+
+
+class BlockTest(unittest.TestCase):
+    def record(self, detector, pages, novel):
+        for day in range(pages):
+            detector.record(CALENDAR.format(2024, day), day < novel)
+
+    def test_template_is_blocked_below_the_novelty_floor(self):
+        detector = TrapDetector(novelty_floor=0.1)
+        self.record(detector, TrapDetector.MIN_SAMPLES - 1, 0)
+        # Too few samples to judge yet.
+        self.assertFalse(detector.is_blocked(CALENDAR.format(2025, 1)))
+        self.record(detector, 1, 0)
+        self.assertTrue(detector.is_blocked(CALENDAR.format(2025, 1)))
+        self.assertFalse(detector.allow(CALENDAR.format(2025, 2)))
+        self.assertEqual(
+            detector.blocked_templates(), ["www.ics.uci.edu/calendar/{n}/{n}"])
+        self.assertFalse(detector.is_blocked("https://www.ics.uci.edu/about"))
+
+    def test_novel_template_is_not_blocked(self):
+        detector = TrapDetector(novelty_floor=0.1)
+        self.record(detector, 40, 4)
+        self.assertFalse(detector.is_blocked(CALENDAR.format(2025, 1)))
+        self.assertEqual(detector.blocked_templates(), [])
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "frontier.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_counts_are_reloaded_from_the_store(self):
+        store = FrontierStore(self.path)
+        detector = TrapDetector(store, budget=3)
+        for day in range(1, 4):
+            self.assertTrue(detector.allow(CALENDAR.format(2024, day)))
+        for day in range(TrapDetector.MIN_SAMPLES):
+            detector.record(f"https://www.ics.uci.edu/news/{day}", False)
+        store.close()
+
+        store = FrontierStore(self.path)
+        detector = TrapDetector(store, budget=3)
+        # The budget was already used up before the restart.
+        self.assertFalse(detector.allow(CALENDAR.format(2024, 4)))
+        self.assertTrue(detector.is_blocked("https://www.ics.uci.edu/news/99"))
+        stats = detector.templates["www.ics.uci.edu/calendar/{n}/{n}"]
+        self.assertEqual(stats.discovered, 4)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
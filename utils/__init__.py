@@ -1,35 +1,57 @@
 import os
-import logging
-from hashlib import sha256
-from urllib.parse import urlparse
-
-def get_logger(name, filename=None):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
-    return logger
+from hashlib import blake2b
+from urllib.parse import urlsplit, urlunsplit
+
+from utils.log import get_logger
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+# Query parameters that only track where a visitor came from.
+TRACKING_PARAMS = frozenset((
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_ga",
+    "_hsenc", "_hsmi", "igshid", "yclid"))
+TRACKING_PREFIXES = ("utm_",)
+
+
+def shard_path(path, shard_id):
+    # crawl_checkpoint.jsonl -> crawl_checkpoint.shard0.jsonl
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard_id}{ext}"
 
 
 def get_urlhash(url):
-    parsed = urlparse(url)
-    # everything other than scheme.
-    return sha256(
-        f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
-        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+    # 128-bit binary key of everything other than the scheme.
+    _, sep, rest = url.partition("://")
+    return blake2b(
+        (rest if sep else url).encode("utf-8"), digest_size=16).digest()
+
+
+def _is_tracking(param):
+    name = param.split("=", 1)[0].lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
 
 def normalize(url):
-    if url.endswith("/"):
+    ''' Canonical spelling of a url, so trivially different spellings map
+    to the same frontier key: lowercase scheme and host, no default port,
+    no fragment, tracking parameters removed and the remaining query
+    parameters sorted. As before, the trailing slash of the path is only
+    dropped when no query follows it, since relative links on the page are
+    resolved against the spelling returned here. Percent-encoding is left
+    as is. '''
+    try:
+        scheme, netloc, path, query, _ = urlsplit(url)
+    except ValueError:
         return url.rstrip("/")
-    return url
+    scheme = scheme.lower()
+    userinfo, at, hostport = netloc.rpartition("@")
+    hostport = hostport.lower()
+    host, colon, port = hostport.rpartition(":")
+    if colon and "]" not in port and DEFAULT_PORTS.get(scheme) == port:
+        hostport = host
+    if query:
+        query = "&".join(sorted(
+            param for param in query.split("&")
+            if param and not _is_tracking(param)))
+    if not query:
+        path = path.rstrip("/")
+    return urlunsplit((scheme, userinfo + at + hostport, path, query, ""))
@@ -0,0 +1,200 @@
+import asyncio
+import cbor
+
+from urllib.parse import urlencode
+
+from utils.response import Response
+from utils.download import oversized
+from utils.metrics import metrics
+
+
+class HttpError(Exception):
+    pass
+
+
+def _parse_int(value, name, base=10):
+    # A malformed number in a reply is an HttpError like any other
+    # malformed reply, so download returns a failed Response for it.
+    try:
+        number = int(value, base)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise HttpError(f"Malformed {name} {value!r}")
+    return number
+
+
+class ConnectionPool(object):
+    ''' Idle keep-alive connections to one (host, port). '''
+
+    def __init__(self, host, port, max_idle):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.idle = list()
+
+    async def acquire(self):
+        ''' Returns (reader, writer, reused). '''
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return reader, writer, False
+
+    def release(self, reader, writer, reusable):
+        if reusable and len(self.idle) < self.max_idle:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class AsyncDownloader(object):
+    ''' Downloads urls through the cache server with asyncio.
+
+    A minimal HTTP/1.1 client over asyncio streams keeps one pool of
+    keep-alive connections per (host, port) and a semaphore bounds the
+    number of outstanding requests, so a single thread can have hundreds
+    of fetches in flight. It returns the same Response objects as
+    utils.download.download. '''
+
+    def __init__(self, config, concurrency=100, timeout=5):
+        self.config = config
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pools = dict()
+        self.concurrency = concurrency
+
+    def _get_pool(self, host, port):
+        pool = self.pools.get((host, port))
+        if pool is None:
+            pool = ConnectionPool(host, port, self.concurrency)
+            self.pools[(host, port)] = pool
+        return pool
+
+    async def download(self, url, logger=None):
+        host, port = self.config.cache_server
+        target = "/?" + urlencode(
+            [("q", f"{url}"), ("u", f"{self.config.user_agent}")])
+        try:
+            async with self.semaphore:
+                status, content = await asyncio.wait_for(
+                    self._get(host, port, target), self.timeout)
+            if content is None:
+                return oversized(url, status, self.config, logger)
+            if status < 400 and content:
+                with metrics.timer("decode"):
+                    return Response(cbor.loads(content))
+        except (OSError, asyncio.TimeoutError, HttpError,
+                asyncio.IncompleteReadError) as e:
+            error = str(e) or type(e).__name__
+            if logger:
+                logger.error(f"Download failed for {url}: {error}")
+            return Response({"error": error, "status": 500, "url": url})
+
+        if logger:
+            logger.error(f"Spacetime Response error {status} with url {url}.")
+        return Response({
+            "error": f"Spacetime Response error {status} with url {url}.",
+            "status": status, "url": url})
+
+    async def _get(self, host, port, target):
+        pool = self._get_pool(host, port)
+        reader, writer, reused = await pool.acquire()
+        try:
+            result, reusable = await self._request(
+                reader, writer, host, port, target,
+                self.config.max_response_bytes)
+        except (OSError, asyncio.IncompleteReadError):
+            writer.close()
+            if not reused:
+                raise
+            # The server may have closed an idle keep-alive connection;
+            # retry once on a fresh one.
+            reader, writer, _ = await pool.acquire()
+            try:
+                result, reusable = await self._request(
+                    reader, writer, host, port, target,
+                    self.config.max_response_bytes)
+            except BaseException:
+                writer.close()
+                raise
+        except BaseException:
+            writer.close()
+            raise
+        pool.release(reader, writer, reusable)
+        return result
+
+    @staticmethod
+    async def _request(reader, writer, host, port, target, max_bytes):
+        # Returns ((status, content), reusable); content is None, and the
+        # rest of the body is left unread, once it is over max_bytes.
+        writer.write(
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Accept-Encoding: identity\r\n"
+            "Connection: keep-alive\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        parts = status_line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise HttpError(f"Malformed status line {status_line!r}")
+        version, status = parts[0], _parse_int(parts[1], "status code")
+
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(b"", None)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = (
+            version == "HTTP/1.1"
+            and headers.get("connection", "").lower() != "close")
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = list()
+            total = 0
+            while True:
+                size = _parse_int(
+                    (await reader.readline()).split(b";")[0], "chunk size", 16)
+                if size == 0:
+                    # Skip trailers up to the terminating blank line.
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                total += size
+                if total > max_bytes:
+                    return (status, None), False
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            length = _parse_int(headers["content-length"], "content length")
+            if length > max_bytes:
+                return (status, None), False
+            content = await reader.readexactly(length)
+        else:
+            content = await reader.read(max_bytes + 1)
+            while len(content) <= max_bytes:
+                more = await reader.read(max_bytes + 1 - len(content))
+                if not more:
+                    break
+                content += more
+            if len(content) > max_bytes:
+                return (status, None), False
+            reusable = False
+        return (status, content), reusable
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
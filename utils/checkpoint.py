@@ -0,0 +1,67 @@
+import os
+import json
+
+from collections import Counter
+
+
+class Checkpoint(object):
+    ''' Append-only JSON lines log of crawl statistics.
+
+    Each save appends one record holding only what changed since the
+    previous save (a StatsDelta), so its cost scales with the new pages.
+    Every compact_every appends the log is replaced by a single record of
+    the totals. Loading folds all records back together; a partially
+    written last line from a crash is ignored. '''
+
+    def __init__(self, path, compact_every=20):
+        self.path = path
+        self.compact_every = compact_every
+        self.appends = 0
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def append(self, delta):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(delta.to_dict(), separators=(",", ":")))
+            f.write("\n")
+        self.appends += 1
+
+    def needs_compaction(self):
+        return self.appends >= self.compact_every
+
+    def compact(self, page_count, word_frequencies, page_word_counts,
+                subdomains):
+        ''' Atomically replaces the log with one record of the totals. '''
+        record = {
+            "pages": page_count, "words": word_frequencies,
+            "page_word_counts": page_word_counts, "subdomains": subdomains}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")))
+            f.write("\n")
+        os.replace(tmp_path, self.path)
+        self.appends = 0
+
+    def load(self):
+        ''' Returns (page_count, word_frequencies, page_word_counts,
+        subdomains) folded from every record in the log. '''
+        page_count = 0
+        word_frequencies = Counter()
+        page_word_counts = dict()
+        subdomains = Counter()
+        if not os.path.exists(self.path):
+            return page_count, word_frequencies, page_word_counts, subdomains
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write at the end of the log.
+                    break
+                page_count += record["pages"]
+                word_frequencies.update(record["words"])
+                page_word_counts.update(record["page_word_counts"])
+                subdomains.update(record["subdomains"])
+        return page_count, word_frequencies, page_word_counts, subdomains
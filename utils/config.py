@@ -8,12 +8,69 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.download_mode = config.get(
+            "LOCAL PROPERTIES", "DOWNLOADMODE", fallback="threaded").strip()
+        assert self.download_mode in {"threaded", "async"}, "DOWNLOADMODE should be threaded or async"
+        self.async_concurrency = config.getint(
+            "LOCAL PROPERTIES", "ASYNCCONCURRENCY", fallback=100)
+        self.parse_processes = config.getint(
+            "LOCAL PROPERTIES", "PARSEPROCESSES", fallback=0)
+        self.shards = config.getint("LOCAL PROPERTIES", "SHARDS", fallback=1)
+        assert self.shards >= 1, "SHARDS should be at least 1"
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.log_url_rate = config.getfloat(
+            "LOCAL PROPERTIES", "LOGURLRATE", fallback=0.0)
+        self.save_flush_count = config.getint(
+            "LOCAL PROPERTIES", "SAVEFLUSHCOUNT", fallback=500)
+        self.save_flush_interval = config.getfloat(
+            "LOCAL PROPERTIES", "SAVEFLUSHINTERVAL", fallback=5.0)
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.max_retries = config.getint("CRAWLER", "MAXRETRIES", fallback=3)
+        self.max_backoff = config.getfloat(
+            "CRAWLER", "MAXBACKOFF", fallback=60.0)
+        self.latency_factor = config.getfloat(
+            "CRAWLER", "LATENCYFACTOR", fallback=1.0)
+        self.max_response_bytes = config.getint(
+            "CRAWLER", "MAXRESPONSEBYTES", fallback=4_000_000)
+        self.trap_detection = config.getboolean(
+            "CRAWLER", "TRAPDETECTION", fallback=True)
+        self.trap_budget = config.getint(
+            "CRAWLER", "TRAPBUDGET", fallback=1000)
+        self.trap_novelty_floor = config.getfloat(
+            "CRAWLER", "TRAPNOVELTYFLOOR", fallback=0.1)
+        self.near_duplicate_distance = config.getint(
+            "CRAWLER", "NEARDUPDISTANCE", fallback=3)
+        self.near_duplicate_capacity = config.getint(
+            "CRAWLER", "NEARDUPCAPACITY", fallback=1_000_000)
+        self.top_words_capacity = config.getint(
+            "CRAWLER", "TOPWORDSCAPACITY", fallback=50_000)
+        self.seen_error_rate = config.getfloat(
+            "CRAWLER", "SEENERRORRATE", fallback=0.0001)
+        self.seen_exact_file = config.get(
+            "CRAWLER", "SEENEXACTFILE", fallback="").strip()
 
-        self.cache_server = None
\ No newline at end of file
+        # Optional url filter overrides; scraper falls back to its defaults.
+        self.allowed_domains = self._get_list(
+            config, "FILTER", "ALLOWEDDOMAINS", ",")
+        self.blocked_extensions = self._get_list(
+            config, "FILTER", "BLOCKEDEXTENSIONS", ",")
+        self.trap_patterns = self._get_list(
+            config, "FILTER", "TRAPPATTERNS", "\n")
+
+        self.metrics_enabled = config.getboolean(
+            "METRICS", "ENABLED", fallback=False)
+        self.metrics_interval = config.getfloat(
+            "METRICS", "LOGINTERVAL", fallback=30.0)
+        self.metrics_port = config.getint("METRICS", "PORT", fallback=0)
+
+        self.cache_server = None
+
+    @staticmethod
+    def _get_list(config, section, key, separator):
+        value = config.get(section, key, fallback="")
+        return [item.strip() for item in value.split(separator) if item.strip()]
\ No newline at end of file
@@ -3,6 +3,8 @@ import cbor
 import time
 
 from utils.response import Response
+from utils.metrics import metrics
+from utils.log import PER_URL
 
 # Create a session with connection pooling
 session = requests.Session()
@@ -10,18 +12,42 @@ adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 
+CHUNK_SIZE = 64 * 1024
+
+
+def read_capped(resp, max_bytes):
+    """ Reads a streamed response body, or returns None as soon as it is
+    known to be over max_bytes, without reading the rest of it. """
+    length = resp.headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        return None
+    chunks = []
+    size = 0
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
 def download(url, config, logger=None):
     """ Downloads a URL using the caching proxy with connection pooling. """
     host, port = config.cache_server
     try:
-        resp = session.get(
+        with session.get(
             f"http://{host}:{port}/",
             params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
-            timeout=5  # Set timeout to prevent hanging
-        )
-        
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+            timeout=5,  # Set timeout to prevent hanging
+            stream=True
+        ) as resp:
+            content = read_capped(resp, config.max_response_bytes)
+
+        if content is None:
+            return oversized(url, resp.status_code, config, logger)
+        if resp and content:
+            with metrics.timer("decode"):
+                return Response(cbor.loads(content))
 
     except requests.exceptions.RequestException as e:
         if logger:
@@ -31,3 +57,14 @@ def download(url, config, logger=None):
     if logger:
         logger.error(f"Spacetime Response error {resp} with url {url}.")
     return Response({"error": f"Spacetime Response error {resp} with url {url}.", "status": resp.status_code, "url": url})
+
+
+def oversized(url, status, config, logger=None):
+    # The page is rejected by the scraper without being decoded.
+    if logger:
+        logger.info(
+            f"Skipped {url}: response over {config.max_response_bytes} bytes.",
+            extra=PER_URL)
+    return Response({
+        "error": f"Response over {config.max_response_bytes} bytes.",
+        "status": status, "url": url, "oversized": True})
@@ -0,0 +1,151 @@
+import os
+import time
+import queue
+import atexit
+import logging
+
+from threading import Lock
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_DIR = "Logs"
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Pass as extra= on lines written once per url, so set_rate_limit can
+# thin them out without touching the other lines of the logger.
+PER_URL = {"per_url": True}
+
+_lock = Lock()
+_handlers = list()
+_listener = None
+_listener_pid = None
+
+
+class _FileRouter(logging.Handler):
+    ''' Writes each record to Logs/<record.log_file>.log. Only runs on the
+    listener thread, so each file is opened once and needs no locking. '''
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.files = dict()
+
+    def emit(self, record):
+        handler = self.files.get(record.log_file)
+        if handler is None:
+            if not os.path.exists(LOG_DIR):
+                os.makedirs(LOG_DIR)
+            handler = logging.FileHandler(f"{LOG_DIR}/{record.log_file}.log")
+            handler.setFormatter(self.formatter)
+            self.files[record.log_file] = handler
+        handler.emit(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+class _FileQueueHandler(QueueHandler):
+    # Tags records with the log file of their logger. The queue never leaves
+    # the process, so records are queued as they are and formatted on the
+    # listener thread instead of being copied and formatted by the caller.
+    def __init__(self, log_queue, log_file):
+        super().__init__(log_queue)
+        self.log_file = log_file
+
+    def prepare(self, record):
+        record.log_file = self.log_file
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    ''' Lets through at most rate PER_URL records per second (token bucket
+    with a one second burst, and room for at least one line so rates below
+    one still pass); the next line that passes notes how many were dropped.
+    Other records always pass. '''
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.dropped = 0
+        self.lock = Lock()
+
+    def filter(self, record):
+        if not getattr(record, "per_url", False):
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return False
+            self.tokens -= 1
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} similar lines dropped)"
+        return True
+
+
+def _start_listener():
+    # Called with _lock held. A forked child inherits the handlers but not
+    # the listener thread, so it gets a queue and listener of its own.
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+    formatter = logging.Formatter(FORMAT)
+    router = _FileRouter()
+    router.setFormatter(formatter)
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    console.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    for handler in _handlers:
+        handler.queue = log_queue
+    _listener = QueueListener(
+        log_queue, router, console, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def get_logger(name, filename=None):
+    ''' Returns the named logger, logging to Logs/<filename or name>.log and
+    the console. Records are handed to a background listener thread through
+    a queue, so callers never wait on file or console I/O. Calling it again
+    for the same name returns the same logger without adding handlers. '''
+    logger = logging.getLogger(name)
+    with _lock:
+        _start_listener()
+        if not any(isinstance(h, _FileQueueHandler) for h in logger.handlers):
+            logger.setLevel(logging.INFO)
+            handler = _FileQueueHandler(
+                _listener.queue, filename if filename else name)
+            _handlers.append(handler)
+            logger.addHandler(handler)
+    return logger
+
+
+def set_rate_limit(logger, rate):
+    ''' Limits the PER_URL lines of logger to rate per second; 0 or less
+    keeps every line. '''
+    for log_filter in list(logger.filters):
+        if isinstance(log_filter, RateLimitFilter):
+            logger.removeFilter(log_filter)
+    if rate > 0:
+        logger.addFilter(RateLimitFilter(rate))
+
+
+@atexit.register
+def flush_logs():
+    ''' Writes out every queued record. Runs at exit; processes that end
+    without running atexit handlers (multiprocessing children) call it. '''
+    global _listener
+    with _lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
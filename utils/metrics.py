@@ -0,0 +1,189 @@
+import time
+
+from bisect import bisect_left
+from threading import Thread, Lock, Event
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds, in seconds, of the histogram buckets (the last is +Inf).
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        ''' Upper bound of the bucket holding the q-th quantile. '''
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+
+class NullTimer(object):
+    ''' Timer handed out while metrics are off; does nothing. '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Timer(object):
+    def __init__(self, metrics, stage, host):
+        self.metrics = metrics
+        self.stage = stage
+        self.host = host
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(
+            self.stage, time.perf_counter() - self.start, self.host)
+        return False
+
+
+class Metrics(object):
+    ''' Hot path instrumentation: per stage and per (stage, host) latency
+    histograms, counters and gauges. While disabled, timer() returns a
+    shared no-op timer and count() returns immediately. '''
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = Lock()
+        self.histograms = dict()
+        self.counters = dict()
+        self.gauges = dict()
+        self.started = time.monotonic()
+
+    def timer(self, stage, host=None):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, stage, host)
+
+    def observe(self, stage, seconds, host=None):
+        if not self.enabled:
+            return
+        with self.lock:
+            keys = [(stage, None)] if host is None else [
+                (stage, None), (stage, host)]
+            for key in keys:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.observe(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_gauge(self, name, callback):
+        ''' Registers a callable read whenever metrics are reported. '''
+        self.gauges[name] = callback
+
+    def summary(self):
+        ''' One line summary for the periodic stats log. '''
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            pages = self.counters.get("pages", 0)
+            parts = [f"pages={pages}", f"pages/s={pages / elapsed:.2f}"]
+            parts.extend(
+                f"{name}={callback()}"
+                for name, callback in self.gauges.items())
+            for (stage, host), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0][0]):
+                if host is None and histogram.count:
+                    parts.append(
+                        f"{stage} avg={histogram.total / histogram.count:.4f}s"
+                        f" p50<={histogram.quantile(0.5)}s"
+                        f" p99<={histogram.quantile(0.99)}s")
+            return ", ".join(parts)
+
+    def prometheus(self):
+        ''' Metrics in the Prometheus text exposition format. '''
+        lines = list()
+        with self.lock:
+            for name, value in self.counters.items():
+                lines.append(f"# TYPE crawler_{name}_total counter")
+                lines.append(f"crawler_{name}_total {value}")
+            for name, callback in self.gauges.items():
+                lines.append(f"# TYPE crawler_{name} gauge")
+                lines.append(f"crawler_{name} {callback()}")
+            lines.append("# TYPE crawler_stage_seconds histogram")
+            for (stage, host), histogram in self.histograms.items():
+                labels = f'stage="{stage}"'
+                if host is not None:
+                    labels += f',host="{host}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else bound
+                    lines.append(
+                        f'crawler_stage_seconds_bucket{{{labels},le="{le}"}}'
+                        f" {cumulative}")
+                lines.append(
+                    f"crawler_stage_seconds_sum{{{labels}}} {histogram.total}")
+                lines.append(
+                    f"crawler_stage_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Process wide metrics, switched on by start_metrics.
+metrics = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics(config, logger):
+    ''' Enables metrics, logs a summary every config.metrics_interval
+    seconds and, if config.metrics_port is set, serves /metrics on
+    localhost. Returns an Event that stops the reporter when set. '''
+    metrics.enabled = True
+    stopped = Event()
+
+    def report():
+        while not stopped.wait(config.metrics_interval):
+            logger.info(f"Stats: {metrics.summary()}")
+
+    Thread(target=report, daemon=True).start()
+    if config.metrics_port:
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", config.metrics_port), MetricsHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(
+            f"Serving metrics on http://127.0.0.1:{config.metrics_port}/metrics")
+    return stopped
@@ -1,14 +1,110 @@
+import io
 import pickle
 
+from requests.structures import CaseInsensitiveDict
+
+
+class _Stub(object):
+    ''' Stands in for every class pickled inside a requests.Response, so a
+    light unpickle keeps the state of the objects without rebuilding the
+    request, cookie jar or history they hold. '''
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.state = None
+        self.items = dict()
+
+    def __setstate__(self, state):
+        self.state = state
+
+    def __setitem__(self, key, value):
+        self.items[key] = value
+
+    def append(self, value):
+        pass
+
+    def extend(self, values):
+        pass
+
+
+class _LightUnpickler(pickle.Unpickler):
+    # Containers and byte decoding stay real, everything else is a _Stub.
+    REAL_MODULES = {"builtins", "copyreg", "collections", "_codecs"}
+
+    def find_class(self, module, name):
+        if module in self.REAL_MODULES:
+            return super().find_class(module, name)
+        return _Stub
+
+
 class Response(object):
+    ''' A page fetched through the cache server.
+
+    The requests.Response pickled in the cache server's reply is only
+    unpickled in full when raw_response is first read. status_code, headers
+    and the body come from a light unpickle instead, and content is a
+    memoryview over the body, so rejected pages are never fully decoded.
+    oversized is set when the download stopped reading a reply over its
+    size cap; such a Response has no body. '''
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        self.oversized = resp_dict.get("oversized", False)
+        self._pickled = resp_dict.get("response")
+        self._raw_response = None
+        self._light = None
+
+    @property
+    def raw_response(self):
+        if self._raw_response is None and self._pickled is not None:
+            try:
+                self._raw_response = pickle.loads(self._pickled)
+            except (TypeError, pickle.UnpicklingError):
+                self._pickled = None
+        return self._raw_response
+
+    def _light_state(self):
+        # {attribute: value} of the pickled requests.Response, or None if it
+        # cannot be read without the full unpickle.
+        if self._light is None:
+            self._light = False
+            try:
+                stub = _LightUnpickler(io.BytesIO(self._pickled)).load()
+                if isinstance(stub, _Stub) and isinstance(stub.state, dict):
+                    self._light = stub.state
+            except Exception:
+                pass
+        return self._light or None
+
+    @property
+    def headers(self):
+        ''' Headers of the page, case insensitive; empty if there are none. '''
+        if self._raw_response is None and self._pickled is not None:
+            state = self._light_state()
+            if state is not None:
+                stub = state.get("headers")
+                store = getattr(stub, "state", None) or {}
+                if isinstance(store, dict) and "_store" in store:
+                    return CaseInsensitiveDict(dict(store["_store"].values()))
+        raw = self.raw_response
+        return (raw.headers if raw is not None else None) or CaseInsensitiveDict()
+
+    @property
+    def body(self):
+        ''' Page bytes, or None when there is no body. '''
+        if self._raw_response is None and self._pickled is not None:
+            state = self._light_state()
+            if state is not None:
+                content = state.get("_content")
+                return content if isinstance(content, bytes) else None
+        raw = self.raw_response
+        return raw.content if raw is not None else None
+
+    @property
+    def content(self):
+        ''' Zero-copy memoryview of the page bytes, or None. '''
+        body = self.body
+        return memoryview(body) if body is not None else None
+
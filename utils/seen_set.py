@@ -0,0 +1,120 @@
+import math
+import sqlite3
+
+from hashlib import blake2b
+from threading import Lock
+
+
+def _hashes(key):
+    digest = blake2b(key.encode("utf-8"), digest_size=16).digest()
+    # Kirsch-Mitzenmacher double hashing: bit i is h1 + i * h2.
+    return (int.from_bytes(digest[:8], "little"),
+            int.from_bytes(digest[8:], "little") | 1)
+
+
+class BloomFilter(object):
+    ''' Fixed size Bloom filter sized for capacity keys at error_rate. '''
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(8, int(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(
+            self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def _positions(self, hashes):
+        h1, h2 = hashes
+        return [(h1 + i * h2) % self.bit_count
+                for i in range(self.hash_count)]
+
+    def contains(self, hashes):
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(hashes))
+
+    def add(self, hashes):
+        bits = self.bits
+        for position in self._positions(hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class SeenSet(object):
+    ''' Memory-compact set of strings that only answers "seen before?".
+
+    A scalable Bloom filter: once a filter holds its capacity a new one,
+    twice as large and with half the error rate, is added, so the false
+    positive rate over any number of keys stays below error_rate. A false
+    positive makes add() report a new key as seen. When exact_path is
+    given, positives are confirmed against an SQLite table there (cleared
+    on open) so the answer is exact, at the cost of one indexed lookup per
+    positive and one buffered insert per new key. '''
+
+    def __init__(self, capacity=100_000, error_rate=0.0001,
+                 exact_path=None):
+        self.error_rate = error_rate
+        self.lock = Lock()
+        self.filters = [BloomFilter(capacity, error_rate / 2)]
+        self.count = 0
+        self.conn = None
+        if exact_path is not None:
+            self.conn = sqlite3.connect(exact_path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM seen")
+            self.conn.commit()
+            self.pending = 0
+
+    def _might_contain(self, hashes):
+        return any(bloom.contains(hashes) for bloom in self.filters)
+
+    def _exact_contains(self, key):
+        return self.conn.execute(
+            "SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is not None
+
+    def add(self, key):
+        ''' Inserts key and returns True, or returns False if it was
+        (probably, or with exact_path certainly) seen before. '''
+        hashes = _hashes(key)
+        with self.lock:
+            if self._might_contain(hashes):
+                if self.conn is None or self._exact_contains(key):
+                    return False
+            bloom = self.filters[-1]
+            if bloom.count >= bloom.capacity:
+                bloom = BloomFilter(
+                    bloom.capacity * 2, bloom.error_rate / 2)
+                self.filters.append(bloom)
+            bloom.add(hashes)
+            self.count += 1
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,))
+                self.pending += 1
+                if self.pending >= 1000:
+                    self.conn.commit()
+                    self.pending = 0
+            return True
+
+    def __contains__(self, key):
+        hashes = _hashes(key)
+        with self.lock:
+            if not self._might_contain(hashes):
+                return False
+            return self.conn is None or self._exact_contains(key)
+
+    def __len__(self):
+        return self.count
+
+    def memory_usage(self):
+        ''' Returns (keys, bytes of filter bits, false positive bound). '''
+        with self.lock:
+            return (self.count,
+                    sum(len(bloom.bits) for bloom in self.filters),
+                    0.0 if self.conn is not None else sum(
+                        bloom.error_rate for bloom in self.filters))
@@ -1,5 +1,6 @@
 import os
 from spacetime import Node
+from utils import shard_path
 from utils.pcc_models import Register
 
 def init(df, user_agent, fresh):
@@ -19,8 +20,16 @@ def init(df, user_agent, fresh):
             df.push()
     return reg.load_balancer
 
+def has_save_file(config):
+    # A sharded crawl only writes the per shard save files.
+    if config.shards > 1:
+        return any(
+            os.path.exists(shard_path(config.save_file, shard_id))
+            for shard_id in range(config.shards))
+    return os.path.exists(config.save_file)
+
 def get_cache_server(config, restart):
     init_node = Node(
         init, Types=[Register], dataframe=(config.host, config.port))
     return init_node.start(
-        config.user_agent, restart or not os.path.exists(config.save_file))
\ No newline at end of file
+        config.user_agent, restart or not has_save_file(config))
\ No newline at end of file
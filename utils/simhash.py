@@ -0,0 +1,99 @@
+from hashlib import blake2b
+from functools import lru_cache
+from threading import Lock
+from collections import deque
+
+# Each of the 64 fingerprint bits gets its own LANE_BITS wide lane in one big
+# integer, so summing weighted token hashes is a few bigint operations per
+# token instead of a 64 step Python loop.
+LANE_BITS = 32
+LANE_MASK = (1 << LANE_BITS) - 1
+
+
+@lru_cache(maxsize=200_000)
+def _spread_hash(token):
+    value = int.from_bytes(
+        blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+    spread = 0
+    for bit in range(64):
+        if value >> bit & 1:
+            spread |= 1 << (bit * LANE_BITS)
+    return spread
+
+
+def simhash(word_counts):
+    ''' 64-bit SimHash of a {token: count} mapping. Bit i is set when the
+    tokens whose hash has bit i set carry more than half the weight. '''
+    lanes = 0
+    total = 0
+    for token, count in word_counts.items():
+        lanes += _spread_hash(token) * count
+        total += count
+    fingerprint = 0
+    for bit in range(64):
+        if 2 * (lanes >> (bit * LANE_BITS) & LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class SimHashIndex(object):
+    ''' Near-duplicate index of 64-bit SimHash fingerprints.
+
+    Two fingerprints within max_distance differing bits must agree on at
+    least one of max_distance + 1 bands (pigeonhole), so a lookup only
+    compares against fingerprints sharing a band. At most capacity
+    fingerprints are kept; the oldest are evicted first. '''
+
+    def __init__(self, max_distance=3, capacity=1_000_000):
+        self.max_distance = max_distance
+        self.capacity = capacity
+        band_count = max_distance + 1
+        widths = [64 // band_count + (i < 64 % band_count)
+                  for i in range(band_count)]
+        self.bands = list()
+        shift = 0
+        for width in widths:
+            self.bands.append((shift, (1 << width) - 1))
+            shift += width
+        self.tables = [dict() for _ in self.bands]
+        self.order = deque()
+        self.lock = Lock()
+
+    def _keys(self, fingerprint):
+        return [fingerprint >> shift & mask for shift, mask in self.bands]
+
+    def find(self, fingerprint):
+        ''' Returns a stored fingerprint within max_distance, or None. '''
+        with self.lock:
+            return self._find(fingerprint, self._keys(fingerprint))
+
+    def _find(self, fingerprint, keys):
+        for table, key in zip(self.tables, keys):
+            for other in table.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return other
+        return None
+
+    def add(self, fingerprint):
+        ''' Stores fingerprint and returns True, or returns False without
+        storing it if a near duplicate is already indexed. '''
+        keys = self._keys(fingerprint)
+        with self.lock:
+            if self._find(fingerprint, keys) is not None:
+                return False
+            for table, key in zip(self.tables, keys):
+                table.setdefault(key, list()).append(fingerprint)
+            self.order.append(fingerprint)
+            if len(self.order) > self.capacity:
+                self._evict(self.order.popleft())
+            return True
+
+    def _evict(self, fingerprint):
+        for table, key in zip(self.tables, self._keys(fingerprint)):
+            bucket = table[key]
+            bucket.remove(fingerprint)
+            if not bucket:
+                del table[key]
+
+    def __len__(self):
+        return len(self.order)
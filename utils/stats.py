@@ -0,0 +1,186 @@
+from itertools import count
+from threading import Lock, local
+from collections import Counter
+
+from utils.topk import HeavyHitters
+
+
+class StatsShard(object):
+    ''' Statistics written by one thread since its last merge. The lock is
+    only contended while a merge or snapshot drains the shard. '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.page_count = 0
+        self.word_frequencies = Counter()
+        self.page_word_counts = dict()
+        self.subdomains = Counter()
+        self.new_urls = list()
+        self.rejections = Counter()
+        self.updates = 0
+
+
+class StatsDelta(object):
+    ''' Statistics merged since the last checkpoint. '''
+
+    def __init__(self):
+        self.page_count = 0
+        self.word_frequencies = Counter()
+        self.page_word_counts = dict()
+        self.subdomains = Counter()
+        self.new_urls = list()
+
+    def to_dict(self):
+        return {
+            "pages": self.page_count, "words": self.word_frequencies,
+            "page_word_counts": self.page_word_counts,
+            "subdomains": self.subdomains, "urls": self.new_urls}
+
+
+class CrawlStats(object):
+    ''' Crawl statistics aggregated from per-thread shards.
+
+    Each worker thread records pages into its own shard and merges it into
+    the shared totals under the global lock every merge_every updates, so
+    pages are not serialized on one lock. snapshot() drains every shard
+    while holding all their locks, so it includes every record_* call that
+    returned before it and no part of a call still running. A page is
+    recorded by several calls (record_url, record_words, record_page), so a
+    snapshot taken between them can count its words but not the page. '''
+
+    def __init__(self, merge_every=50, word_capacity=None):
+        self.merge_every = merge_every
+        self.lock = Lock()
+        self.local = local()
+        self.shards = list()
+        # next() on itertools.count is atomic, so page numbers are unique
+        # across threads without a lock.
+        self.page_numbers = count(1)
+
+        self.page_count = 0
+        # Bounded to word_capacity counters; None counts every word exactly.
+        self.word_frequencies = HeavyHitters(word_capacity)
+        self.page_word_counts = dict()
+        # Pages are only recorded once per unique url, so counts suffice.
+        self.subdomains = Counter()
+        # Pages rejected, by the scraper stage that rejected them.
+        self.rejection_counts = Counter()
+        self.delta = StatsDelta()
+
+    def _get_shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = StatsShard()
+            self.local.shard = shard
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def record_words(self, url, page_words):
+        ''' Adds a parsed page's word Counter and its word count. '''
+        shard = self._get_shard()
+        with shard.lock:
+            shard.word_frequencies.update(page_words)
+            shard.page_word_counts[url] = sum(page_words.values())
+            shard.updates += 1
+        self._maybe_merge(shard)
+
+    def record_url(self, url):
+        ''' Notes a url seen for the first time. '''
+        shard = self._get_shard()
+        with shard.lock:
+            shard.new_urls.append(url)
+            shard.updates += 1
+        self._maybe_merge(shard)
+
+    def record_rejection(self, stage):
+        ''' Counts a page rejected by the given scraper stage. '''
+        shard = self._get_shard()
+        with shard.lock:
+            shard.rejections[stage] += 1
+            shard.updates += 1
+        self._maybe_merge(shard)
+
+    def record_page(self, url, subdomain=None):
+        ''' Counts an accepted page and returns its crawl-wide number. '''
+        shard = self._get_shard()
+        with shard.lock:
+            shard.page_count += 1
+            if subdomain is not None:
+                shard.subdomains[subdomain] += 1
+            shard.updates += 1
+        self._maybe_merge(shard)
+        return next(self.page_numbers)
+
+    def _maybe_merge(self, shard):
+        if shard.updates >= self.merge_every:
+            with self.lock:
+                with shard.lock:
+                    self._merge(shard)
+
+    def _merge(self, shard):
+        # Called with the global lock and the shard lock held.
+        for totals in (self, self.delta):
+            totals.page_count += shard.page_count
+            totals.word_frequencies.update(shard.word_frequencies)
+            totals.page_word_counts.update(shard.page_word_counts)
+            totals.subdomains.update(shard.subdomains)
+        self.delta.new_urls.extend(shard.new_urls)
+        self.rejection_counts.update(shard.rejections)
+        shard.reset()
+
+    def _merge_all(self):
+        # Called with the global lock held.
+        shards = list(self.shards)
+        for shard in shards:
+            shard.lock.acquire()
+        try:
+            for shard in shards:
+                self._merge(shard)
+        finally:
+            for shard in shards:
+                shard.lock.release()
+
+    def snapshot(self):
+        ''' Merges all shards and returns a copy of the totals as
+        (page_count, word_frequencies, page_word_counts, subdomain_counts),
+        where word_frequencies holds the retained word counters. '''
+        with self.lock:
+            self._merge_all()
+            return (
+                self.page_count, dict(self.word_frequencies.items()),
+                dict(self.page_word_counts), dict(self.subdomains))
+
+    def rejections(self):
+        ''' Merges all shards and returns {stage: pages rejected}. '''
+        with self.lock:
+            self._merge_all()
+            return dict(self.rejection_counts)
+
+    def top_words(self, n=50):
+        ''' Merges all shards and returns the n most frequent words. '''
+        with self.lock:
+            self._merge_all()
+            return self.word_frequencies.most_common(n)
+
+    def take_delta(self):
+        ''' Merges all shards and returns the StatsDelta accumulated since
+        the previous call, so checkpoints cost O(new pages). '''
+        with self.lock:
+            self._merge_all()
+            delta, self.delta = self.delta, StatsDelta()
+            return delta
+
+    def restore(self, page_count, word_frequencies, page_word_counts,
+                subdomains, rejections=None):
+        ''' Adds totals loaded from a checkpoint, or another crawl shard. '''
+        with self.lock:
+            self.page_count += page_count
+            self.word_frequencies.update(word_frequencies)
+            self.page_word_counts.update(page_word_counts)
+            self.subdomains.update(subdomains)
+            if rejections:
+                self.rejection_counts.update(rejections)
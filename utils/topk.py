@@ -0,0 +1,100 @@
+import heapq
+
+
+class HeavyHitters(object):
+    ''' Space-Saving heavy hitters with an incrementally maintained top k.
+
+    At most capacity counters are kept. When a new item arrives and all
+    counters are taken, the item with the smallest count is replaced and
+    the newcomer inherits that count as its possible overestimate, so any
+    count is at most total / capacity too high and every item more
+    frequent than that is kept. capacity=None keeps every item (exact).
+
+    The k largest counters are tracked as they grow, so most_common(n) for
+    n <= k only sorts k items instead of scanning every counter. '''
+
+    def __init__(self, capacity=None, k=50):
+        self.capacity = capacity
+        self.k = k
+        self.counts = dict()
+        self.errors = dict()
+        # One (count, item) entry per counter; entries may hold an older,
+        # smaller count and are corrected lazily when they reach the top.
+        self.heap = list()
+        self.top = dict()
+        self.top_min = None
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def items(self):
+        return self.counts.items()
+
+    def update(self, counts):
+        ''' Adds a {item: count} mapping, like Counter.update. '''
+        for item, count in counts.items():
+            self.add(item, count)
+
+    def add(self, item, count=1):
+        self.total += count
+        if item in self.counts:
+            new_count = self.counts[item] + count
+        elif self.capacity is None or len(self.counts) < self.capacity:
+            new_count = count
+            self.errors[item] = 0
+            heapq.heappush(self.heap, (count, item))
+        else:
+            floor = self._evict_min()
+            new_count = floor + count
+            self.errors[item] = floor
+            heapq.heappush(self.heap, (new_count, item))
+        self.counts[item] = new_count
+        self._update_top(item, new_count)
+
+    def _evict_min(self):
+        while True:
+            count, item = self.heap[0]
+            if self.counts[item] != count:
+                heapq.heapreplace(self.heap, (self.counts[item], item))
+                continue
+            heapq.heappop(self.heap)
+            del self.counts[item]
+            del self.errors[item]
+            if item in self.top:
+                # Only possible when capacity is close to k.
+                self._rebuild_top()
+            return count
+
+    def _update_top(self, item, count):
+        if item in self.top:
+            self.top[item] = count
+            if item == self.top_min:
+                self.top_min = min(self.top, key=self.top.get)
+        elif len(self.top) < self.k:
+            self.top[item] = count
+            if self.top_min is None or count < self.top[self.top_min]:
+                self.top_min = item
+        elif count > self.top[self.top_min]:
+            del self.top[self.top_min]
+            self.top[item] = count
+            self.top_min = min(self.top, key=self.top.get)
+
+    def _rebuild_top(self):
+        self.top = dict(heapq.nlargest(
+            self.k, self.counts.items(), key=lambda pair: pair[1]))
+        self.top_min = (
+            min(self.top, key=self.top.get) if self.top else None)
+
+    def most_common(self, n=None):
+        ''' Returns up to n (item, count) pairs, largest first. n may not
+        exceed k. '''
+        n = self.k if n is None else n
+        if n > self.k:
+            raise ValueError(f"Only the top {self.k} items are tracked.")
+        return sorted(
+            self.top.items(), key=lambda pair: pair[1], reverse=True)[:n]
+
+    def error(self, item):
+        ''' Upper bound on how much item's count is overestimated. '''
+        return self.errors.get(item, 0)
@@ -0,0 +1,153 @@
+import re
+
+from threading import Lock
+
+from utils.url_filter import URL_RE
+
+DATE_RE = re.compile(r"\d{4}[-_/]?\d{1,2}(?:[-_/]?\d{1,2})?")
+
+
+class TemplateStats(object):
+    ''' Counts of one url template: new urls discovered, pages fetched and
+    how many of those had novel content. '''
+
+    __slots__ = ("discovered", "fetched", "novel", "blocked")
+
+    def __init__(self, discovered=0, fetched=0, novel=0, blocked=False):
+        self.discovered = discovered
+        self.fetched = fetched
+        self.novel = novel
+        self.blocked = blocked
+
+    def as_row(self):
+        return self.discovered, self.fetched, self.novel, int(self.blocked)
+
+
+class TrapDetector(object):
+    ''' Online crawler trap detector based on url templates.
+
+    Each url maps to a template of its host and path, with numbers, dates
+    and ids replaced by placeholders and query values dropped, e.g.
+    www.ics.uci.edu/calendar/{n}/{n} or www.ics.uci.edu/news/item?session=.
+    Urls deeper than max_depth or repeating a path segment repeat_limit
+    times are refused outright. Past budget discovered urls, a template is
+    throttled to one url in THROTTLE. Once MIN_SAMPLES of its pages were
+    fetched, it is blocked if fewer than novelty_floor of them had novel
+    content.
+
+    Counts are kept in the frontier's save file through store, so a resumed
+    crawl keeps what it learned. '''
+
+    THROTTLE = 10
+    MIN_SAMPLES = 20
+
+    def __init__(self, store=None, budget=1000, novelty_floor=0.1,
+                 max_depth=12, repeat_limit=3, logger=None):
+        self.store = store
+        self.budget = budget
+        self.novelty_floor = novelty_floor
+        self.max_depth = max_depth
+        self.repeat_limit = repeat_limit
+        self.logger = logger
+        self.lock = Lock()
+        self.templates = dict()
+        if store is not None:
+            for template, row in store.trap_templates():
+                self.templates[template] = TemplateStats(*row)
+
+    @classmethod
+    def from_config(cls, config, store=None, logger=None):
+        return cls(
+            store, config.trap_budget, config.trap_novelty_floor,
+            logger=logger)
+
+    @staticmethod
+    def _placeholder(segment):
+        if DATE_RE.fullmatch(segment):
+            return "{date}"
+        if segment.isdigit():
+            return "{n}"
+        if any(char.isdigit() for char in segment):
+            return "{id}"
+        return segment
+
+    def template(self, url):
+        ''' Returns (template, segments) for an http(s) url, or None. '''
+        match = URL_RE.match(url)
+        if match is None:
+            return None
+        segments = [segment for segment in match.group(3).split("/") if segment]
+        path = "/".join(self._placeholder(segment) for segment in segments)
+        template = f"{match.group(2).lower()}/{path}"
+        query = url[match.end():].partition("#")[0]
+        if query.startswith("?") and len(query) > 1:
+            names = sorted({
+                param.partition("=")[0] for param in query[1:].split("&")
+                if param})
+            template += "?" + "&".join(f"{name}=" for name in names)
+        return template, segments
+
+    def _save(self, template, stats):
+        # Called with the lock held.
+        if self.store is not None:
+            self.store.set_trap_template(template, stats.as_row())
+
+    def allow(self, url):
+        ''' Counts a newly discovered url against its template and decides
+        whether it is admitted to the frontier. '''
+        parsed = self.template(url)
+        if parsed is None:
+            return True
+        template, segments = parsed
+        if len(segments) > self.max_depth:
+            return False
+        if segments and max(
+                segments.count(segment) for segment in set(segments)
+                ) >= self.repeat_limit:
+            return False
+        with self.lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                stats = self.templates[template] = TemplateStats()
+            if stats.blocked:
+                return False
+            stats.discovered += 1
+            self._save(template, stats)
+            over_budget = stats.discovered - self.budget
+            return over_budget <= 0 or over_budget % self.THROTTLE == 0
+
+    def is_blocked(self, url):
+        parsed = self.template(url)
+        if parsed is None:
+            return False
+        with self.lock:
+            stats = self.templates.get(parsed[0])
+            return stats is not None and stats.blocked
+
+    def record(self, url, novel):
+        ''' Feeds back whether a fetched page had novel content, blocking
+        its template once it falls under the novelty floor. '''
+        parsed = self.template(url)
+        if parsed is None:
+            return
+        template = parsed[0]
+        with self.lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                stats = self.templates[template] = TemplateStats()
+            stats.fetched += 1
+            stats.novel += bool(novel)
+            if (not stats.blocked and stats.fetched >= self.MIN_SAMPLES
+                    and stats.novel < self.novelty_floor * stats.fetched):
+                stats.blocked = True
+                if self.logger:
+                    self.logger.warning(
+                        f"Blocking url template {template}: {stats.novel} "
+                        f"of {stats.fetched} pages were novel.")
+            self._save(template, stats)
+
+    def blocked_templates(self):
+        with self.lock:
+            return sorted(
+                template for template, stats in self.templates.items()
+                if stats.blocked)
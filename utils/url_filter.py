@@ -0,0 +1,84 @@
+import re
+
+# Scheme, network location and path of an http(s) url in one C-level match,
+# which is much cheaper than urlsplit for urls the lru cache has not seen.
+URL_RE = re.compile(r"(https?)://([^/?#]*)([^?#]*)", re.IGNORECASE)
+
+
+class UrlFilter(object):
+    ''' Precompiled url filter. Each url is matched once against URL_RE and
+    its parts are checked against a set of blocked file extensions, a
+    reversed-label trie of allowed domains (a host is allowed if it is one of
+    the domains or a subdomain of one), and a single combined regex of
+    crawler trap patterns. '''
+
+    def __init__(self, allowed_domains, blocked_extensions, trap_patterns):
+        self.blocked_extensions = frozenset(
+            ext.lower().lstrip(".") for ext in blocked_extensions)
+        # Allowed domains keyed by their reversed labels, so a host matches
+        # only on a label boundary (physics.uci.edu is not ics.uci.edu).
+        self.domain_trie = dict()
+        for domain in allowed_domains:
+            node = self.domain_trie
+            for label in reversed(domain.lower().strip(".").split(".")):
+                node = node.setdefault(label, dict())
+            # An empty key marks the end of an allowed domain.
+            node[""] = True
+        self.trap_re = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in trap_patterns)
+            if trap_patterns else r"(?!)")
+
+    @classmethod
+    def from_config(cls, config, default_domains, default_extensions,
+                    default_traps):
+        ''' Builds a filter from the optional [FILTER] section values on a
+        Config object, falling back to the given defaults. '''
+        return cls(
+            config.allowed_domains or default_domains,
+            config.blocked_extensions or default_extensions,
+            config.trap_patterns or default_traps)
+
+    def is_allowed_host(self, host):
+        node = self.domain_trie
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                return False
+            if "" in node:
+                return True
+        return False
+
+    @staticmethod
+    def _get_host(netloc):
+        # Cheaper than SplitResult.hostname: drop userinfo and port.
+        if "@" in netloc:
+            netloc = netloc.rpartition("@")[2]
+        if ":" in netloc and not netloc.startswith("["):
+            netloc = netloc.partition(":")[0]
+        return netloc.lower()
+
+    def has_blocked_extension(self, path):
+        # Ignore ;params on the last segment, as urlparse does.
+        last_segment = path.rfind("/")
+        params = path.find(";", last_segment + 1)
+        if params != -1:
+            path = path[:params]
+        dot = path.rfind(".")
+        return (dot != -1
+                and path[dot + 1:].lower() in self.blocked_extensions)
+
+    def is_trap(self, url):
+        return self.trap_re.search(url) is not None
+
+    def is_valid(self, url):
+        ''' Determines if a URL should be crawled. '''
+        match = URL_RE.match(url)
+        if match is None:
+            # Only http and https urls are crawled.
+            return False
+        host = self._get_host(match.group(2))
+        if not host or not self.is_allowed_host(host):
+            return False
+        if self.trap_re.search(url):
+            return False
+        return not self.has_blocked_extension(match.group(3))